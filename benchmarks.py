@@ -0,0 +1,233 @@
+"""
+Headless timings of the storymaker hot paths, for telling whether a change made it faster.
+
+Every benchmark drives a real `StoryMaker` under SDL's dummy video driver, so no window
+opens and the numbers can be taken on a build machine:
+
+    python benchmarks.py -o results.json
+    python benchmarks.py --baseline baseline.json --threshold 0.15
+
+Results are written as JSON. With --baseline every benchmark is compared against the
+stored median and the run fails when one is slower by more than the threshold, so a
+baseline taken on the same machine can guard against regressions. The history of
+generated boards and the save store are kept in a temporary folder and HTML saves
+are never written, so a run leaves the saves folder untouched.
+"""
+
+import os
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")  # Before pygame opens a display
+
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import statistics
+import pygame
+import storymaker
+from history import History
+from savestore import SaveStore
+
+DEFAULT_REPEAT = 200
+
+
+# NullWriter class
+class NullWriter:
+    """
+    Stands in for `BackgroundWriter`: keeps the size of the last page instead of writing it.
+
+    A page handed over as a function is rendered right away, so its cost is measured.
+    """
+
+    def __init__(self):
+        self.written = 0
+
+    def write(self, path, text, then=None):
+        if callable(text):
+            text = text()
+        self.written = len(text)
+        if then is not None:
+            then(path)
+
+    def close(self):
+        pass
+
+
+def time_calls(function, repeat, setup=None):
+    """
+    Call `function` `repeat` times and return the duration of each call in seconds.
+
+    Args:
+        function (callable): The code being timed.
+        repeat (int): The number of timed calls.
+        setup (callable, optional): Called before each call, outside the timing.
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(timings, unit_count=1):
+    """
+    Return the median, fastest and p95 durations in microseconds per unit of work.
+    """
+    timings = sorted(t / unit_count for t in timings)
+    return {
+        "median_us": statistics.median(timings) * 1e6,
+        "min_us": timings[0] * 1e6,
+        "p95_us": timings[int(len(timings) * 0.95) if len(timings) > 1 else 0] * 1e6,
+        "runs": len(timings),
+    }
+
+
+def run_benchmarks(repeat=DEFAULT_REPEAT, only=None):
+    """
+    Time the storymaker hot paths on a headless StoryMaker.
+
+    Args:
+        repeat (int, optional): The number of timed calls of each benchmark.
+        only (list, optional): Run only the benchmarks with these names.
+
+    Returns:
+        dict: The summary of each benchmark, keyed by its name.
+    """
+    history_dir = tempfile.mkdtemp(prefix="storymaker-bench-")
+    storymaker.open_in_browser = lambda path: None  # Never launch a browser
+    app = storymaker.StoryMaker()
+    app.history = History(
+        os.path.join(history_dir, "history.bloom"),
+        os.path.join(history_dir, "history.log"),
+        capacity=1000000,
+    )
+    app.save_store = SaveStore(
+        os.path.join(history_dir, "boards.log"), os.path.join(history_dir, "boards.idx")
+    )
+    app.save_writer = NullWriter()
+    app.draw_ui()  # Opens the display and loads fonts, background and the first board
+
+    motion_events = [
+        pygame.event.Event(
+            pygame.MOUSEMOTION, pos=(280 + i % 200, 225 + i % 300), buttons=(1, 0, 0)
+        )
+        for i in range(100)
+    ]
+    theme_files = [f for f in sorted(os.listdir("data")) if f.endswith(".json")]
+
+    def drag():
+        app.dragging = True
+        app.dragged_phrase_index = 0
+        for event in motion_events:
+            app.handle_dragging(event)
+        app.dirty_rects.clear()
+
+    def switch_themes():
+        for file_name in theme_files:
+            app.load_data(file_name)
+
+    # name: (function, setup, units of work per call)
+    benchmarks = {
+        "generate_phrases": (app.generate_phrases, None, 1),
+        "generate_icons_cold": (app.generate_icons, app.icon_cache.invalidate, 1),
+        "generate_icons_warm": (app.generate_icons, None, 1),
+        "draw_ui": (app.draw_ui, None, 1),
+        "handle_dragging_motion": (drag, None, len(motion_events)),
+        "load_data": (switch_themes, None, len(theme_files)),
+        "save_state": (app.save_state, None, 1),
+    }
+
+    results = {}
+    try:
+        for name, (function, setup, units) in benchmarks.items():
+            if only and name not in only:
+                continue
+            function()  # Warm up caches the benchmark is not about
+            results[name] = summarize(time_calls(function, repeat, setup), units)
+    finally:
+        app.close()
+        shutil.rmtree(history_dir, ignore_errors=True)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare results against a baseline.
+
+    Args:
+        results (dict): The benchmark summaries of this run.
+        baseline (dict): The benchmark summaries of the baseline run.
+        threshold (float): The allowed slowdown, e.g. 0.1 for 10%.
+
+    Returns:
+        list: (name, baseline median, median, ratio, regressed) of each benchmark
+        present in both.
+    """
+    rows = []
+    for name, summary in results.items():
+        if name not in baseline:
+            continue
+        before = baseline[name]["median_us"]
+        after = summary["median_us"]
+        ratio = after / before if before else float("inf")
+        rows.append((name, before, after, ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time the storymaker hot paths headless and compare to a baseline."
+    )
+    parser.add_argument(
+        "-o", "--output", default="bench_results.json", help="results file"
+    )
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="allowed slowdown against the baseline (default: 0.10 = 10%%)",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=DEFAULT_REPEAT, help="timed calls per benchmark"
+    )
+    parser.add_argument("--only", nargs="*", help="names of the benchmarks to run")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.repeat, args.only)
+    report = {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "pygame": pygame.version.ver,
+        "platform": platform.platform(),
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as file:
+        json.dump(report, file, indent=2)
+
+    for name, summary in results.items():
+        print(
+            f"{name:>24}: {summary['median_us']:10.1f} us median"
+            f"  {summary['min_us']:10.1f} us min"
+        )
+    print(f"wrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)["results"]
+        rows = compare(results, baseline, args.threshold)
+        for name, before, after, ratio, regressed in rows:
+            flag = "REGRESSION" if regressed else "ok"
+            print(f"{name:>24}: {before:10.1f} -> {after:10.1f} us  x{ratio:.2f}  {flag}")
+        if any(row[4] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
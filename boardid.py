@@ -0,0 +1,234 @@
+"""
+Compact IDs for story boards: a whole board encoded as one integer, shown in base32.
+
+A board is fully determined by its theme, one word index per category for each of its
+phrases and the indexes of its icons in the theme's sorted icon folder. Those indexes
+are the digits of a mixed-radix number: the theme is the lowest digit, followed by the
+word indexes (the radix of each is the length of its category's word list) and then
+the icons. The icons are an ordered selection without repeats, so each icon digit is
+its rank among the icons not used yet and its radix shrinks by one per icon.
+
+Encoding and decoding touch a fixed number of digits, so both are O(1) for a given
+number of phrases and icons, and no search is needed to go from an ID back to a board.
+
+An ID stays valid as long as the theme list, the word lists and the icon folders do
+not change. Below all the digits sits a 10-bit check value: a hash of the theme list
+and of the lengths of the ID's theme's word lists and icon folder. When the theme list
+or those lengths change, decoding an old ID raises an error instead of silently
+producing a different board; about one stale ID in a thousand still passes.
+
+    python boardid.py 3K9T4Z0QX7...   # print the board of an ID
+"""
+
+import sys
+import zlib
+
+from storyseeds import DEFAULT_CATEGORIES, icon_files, icon_folder
+
+# Crockford's base32: no I, L, O or U, so IDs are easy to read out and type
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DIGITS = {char: value for value, char in enumerate(ALPHABET)}
+_DIGITS.update({"I": 1, "L": 1, "O": 0})  # Common misreadings
+
+CHECK_BITS = 10  # Two base32 characters
+
+
+def to_base32(number):
+    """
+    Return a non-negative integer as a Crockford base32 string.
+    """
+    chars = []
+    while True:
+        number, digit = divmod(number, 32)
+        chars.append(ALPHABET[digit])
+        if not number:
+            return "".join(reversed(chars))
+
+
+def from_base32(text):
+    """
+    Return the integer of a Crockford base32 string; dashes and case are ignored.
+
+    Raises:
+        ValueError: If the text contains a character that is not a base32 digit.
+    """
+    text = text.strip().replace("-", "").upper()
+    if not text:
+        raise ValueError("empty board ID")
+    number = 0
+    for char in text:
+        if char not in _DIGITS:
+            raise ValueError(f"{char!r} is not a base32 digit")
+        number = number * 32 + _DIGITS[char]
+    return number
+
+
+# BoardCodec class
+class BoardCodec:
+    """
+    Encodes boards as integers and decodes integers back into boards.
+
+    Args:
+        word_bank (WordBank): The word lists of every theme.
+        categories (list, optional): The categories joined to build each phrase.
+        num_phrases (int, optional): The number of phrases on a board. Defaults to 5.
+        num_icons (int, optional): The number of icons on a board. Defaults to 5.
+        icons_dir (str, optional): The root folder of the icon folders. Defaults to "icons".
+
+    Methods:
+        encode(theme, word_indices, icon_indices): Return the ID of a board.
+        decode(board_id): Return (theme, word_indices, icon_indices) of an ID.
+        phrases(theme, word_indices): Return the phrase strings of a board.
+        icon_paths(theme): Return the theme's icon paths, in index order.
+
+    `word_indices` holds one tuple of word indexes per phrase, in category order.
+
+    Example:
+        codec = BoardCodec(word_bank)
+        board_id = codec.encode("Medieval", [(3, 14, 15)] * 5, [9, 2, 6, 5, 35])
+        print(to_base32(board_id), codec.decode(board_id))
+    """
+
+    def __init__(
+        self,
+        word_bank,
+        categories=DEFAULT_CATEGORIES,
+        num_phrases=5,
+        num_icons=5,
+        icons_dir="icons",
+    ):
+        self.word_bank = word_bank
+        self.categories = list(categories)
+        self.num_phrases = num_phrases
+        self.num_icons = num_icons
+        self.icons_dir = icons_dir
+        self.themes = sorted(word_bank.themes())
+        self._theme_index = {theme: i for i, theme in enumerate(self.themes)}
+        self._icon_paths = {}  # theme -> sorted icon paths, globbed on first use
+
+    def icon_paths(self, theme):
+        paths = self._icon_paths.get(theme)
+        if paths is None:
+            folder = icon_folder(theme, self.icons_dir)
+            paths = self._icon_paths[theme] = icon_files(folder, self.icons_dir)
+        return paths
+
+    def _word_radices(self, theme):
+        words = self.word_bank[theme]
+        return [len(words[category]) for category in self.categories]
+
+    def _check(self, theme):
+        layout = [
+            ",".join(self.themes),
+            theme,
+            ",".join(map(str, self._word_radices(theme))),
+            str(len(self.icon_paths(theme))),
+            f"{self.num_phrases},{self.num_icons}",
+        ]
+        return zlib.crc32("|".join(layout).encode("utf-8")) & ((1 << CHECK_BITS) - 1)
+
+    def encode(self, theme, word_indices, icon_indices):
+        """
+        Return the integer ID of a board.
+
+        Raises:
+            ValueError: If the theme is unknown or an index is out of range.
+        """
+        if theme not in self._theme_index:
+            raise ValueError(f"unknown theme {theme!r}")
+        if len(word_indices) != self.num_phrases:
+            raise ValueError(f"a board has {self.num_phrases} phrases")
+        num_icons = min(self.num_icons, len(self.icon_paths(theme)))
+        if len(icon_indices) != num_icons or len(set(icon_indices)) != num_icons:
+            raise ValueError(f"a {theme} board has {num_icons} distinct icons")
+
+        # Digits from the most significant one down, so the theme ends up lowest
+        number = 0
+        num_available = len(self.icon_paths(theme))
+        for position in reversed(range(num_icons)):
+            index = icon_indices[position]
+            if not 0 <= index < num_available:
+                raise ValueError(f"icon index {index} out of range")
+            # Rank among the icons not used by an earlier position
+            rank = index - sum(1 for used in icon_indices[:position] if used < index)
+            number = number * (num_available - position) + rank
+
+        radices = self._word_radices(theme)
+        for phrase in reversed(word_indices):
+            for index, radix in zip(reversed(phrase), reversed(radices)):
+                if not 0 <= index < radix:
+                    raise ValueError(f"word index {index} out of range")
+                number = number * radix + index
+
+        number = number * len(self.themes) + self._theme_index[theme]
+        return number << CHECK_BITS | self._check(theme)
+
+    def decode(self, board_id):
+        """
+        Return (theme, word_indices, icon_indices) of an integer ID.
+
+        Raises:
+            ValueError: If the ID is negative, larger than any board of its theme, or was
+            made with a different theme list, word lists or icon folder.
+        """
+        if board_id < 0:
+            raise ValueError("board IDs are not negative")
+        check = board_id & ((1 << CHECK_BITS) - 1)
+        number, theme_index = divmod(board_id >> CHECK_BITS, len(self.themes))
+        theme = self.themes[theme_index]
+        if check != self._check(theme):
+            raise ValueError("board ID does not match the current themes or icons")
+
+        radices = self._word_radices(theme)
+        word_indices = []
+        for _ in range(self.num_phrases):
+            phrase = []
+            for radix in radices:
+                number, index = divmod(number, radix)
+                phrase.append(index)
+            word_indices.append(tuple(phrase))
+
+        num_available = len(self.icon_paths(theme))
+        num_icons = min(self.num_icons, num_available)
+        icon_indices = []
+        for position in range(num_icons):
+            number, rank = divmod(number, num_available - position)
+            # Turn the rank among unused icons back into an icon index
+            for used in sorted(icon_indices):
+                if used <= rank:
+                    rank += 1
+            icon_indices.append(rank)
+
+        if number:
+            raise ValueError("board ID out of range")
+        return theme, word_indices, icon_indices
+
+    def phrases(self, theme, word_indices):
+        words = self.word_bank[theme]
+        return [
+            " ".join(
+                words[category][index]
+                for category, index in zip(self.categories, phrase)
+            )
+            for phrase in word_indices
+        ]
+
+
+def main(argv=None):
+    from wordbank import open_word_bank
+
+    argv = sys.argv[1:] if argv is None else argv
+    word_bank = open_word_bank()
+    codec = BoardCodec(word_bank)
+    for text in argv:
+        theme, word_indices, icon_indices = codec.decode(from_base32(text))
+        print(f"{text}: {theme}")
+        for phrase in codec.phrases(theme, word_indices):
+            print(f"    {phrase}")
+        for index in icon_indices:
+            print(f"    {codec.icon_paths(theme)[index]}")
+    word_bank.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Persistent record of generated phrases and icon combinations, so they are not handed out twice.
+
+Every generated key is appended to a log of 16-byte hashes and set in a Bloom filter.
+The filter is a fixed-size bit array memory-mapped from disk, so loading it at startup
+is instant, membership tests are O(1) and memory stays bounded no matter how many
+entries are recorded. A Bloom filter can report a key as seen when it was not (about
+1% of the time at its rated capacity), but never the other way round; a false
+positive only means one candidate is redrawn.
+
+The log is the source of truth: `rebuild` replays it into a new filter, e.g. with a
+larger capacity once the old one fills up.
+"""
+
+import os
+import math
+import mmap
+import struct
+import hashlib
+
+MAGIC = b"HBLM"
+VERSION = 1
+HEADER = struct.Struct("<4sIQIQ")  # magic, version, bits, hashes, entries
+
+DEFAULT_FILTER_PATH = os.path.join("saves", "history.bloom")
+DEFAULT_LOG_PATH = os.path.join("saves", "history.log")
+
+
+def key_hash(key):
+    """
+    Return the 16-byte hash recorded for a key.
+    """
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+
+
+def filter_size(capacity, error_rate):
+    """
+    Return the number of bits and hash functions for a Bloom filter.
+
+    Args:
+        capacity (int): The number of entries the filter is rated for.
+        error_rate (float): The false positive rate at full capacity.
+    """
+    bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+    hashes = max(1, round(bits / capacity * math.log(2)))
+    return bits, hashes
+
+
+# History class
+class History:
+    """
+    An append-only, disk-backed history of generated keys with a Bloom filter index.
+
+    Args:
+        filter_path (str, optional): The memory-mapped Bloom filter file.
+        log_path (str, optional): The append-only log of key hashes.
+        capacity (int, optional): The number of entries a new filter is rated for.
+        Ignored when the filter file already exists. Defaults to 20 million (24 MB).
+        error_rate (float, optional): The false positive rate of a new filter at
+        capacity. Defaults to 0.01.
+
+    Methods:
+        add(key): Record a key.
+        draw_unseen(draw, key, attempts): Draw candidates until one has not been seen.
+        flush(): Push recorded entries to disk.
+        close(): Flush and release the files.
+
+    Example:
+        history = History()
+        if "Medieval:Ancient Keep Guard" not in history:
+            history.add("Medieval:Ancient Keep Guard")
+        history.close()
+    """
+
+    def __init__(
+        self,
+        filter_path=DEFAULT_FILTER_PATH,
+        log_path=DEFAULT_LOG_PATH,
+        capacity=20000000,
+        error_rate=0.01,
+    ):
+        if not os.path.exists(filter_path):
+            bits, hashes = filter_size(capacity, error_rate)
+            with open(filter_path, "wb") as file:
+                file.write(HEADER.pack(MAGIC, VERSION, bits, hashes, 0))
+                file.truncate(HEADER.size + (bits + 7) // 8)  # Sparse, zero-filled
+
+        self._file = open(filter_path, "r+b")
+        self._map = mmap.mmap(self._file.fileno(), 0)
+        magic, version, self.bits, self.hashes, self.entries = HEADER.unpack_from(
+            self._map
+        )
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{filter_path} is not a version {VERSION} history filter")
+        self._log = open(log_path, "ab")
+
+    def _positions(self, digest):
+        # Double hashing: the i-th bit is h1 + i * h2, all modulo the filter size
+        h1, h2 = struct.unpack("<QQ", digest)
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, key):
+        bit_array = self._map
+        for position in self._positions(key_hash(key)):
+            if not bit_array[HEADER.size + (position >> 3)] & (1 << (position & 7)):
+                return False
+        return True
+
+    def add(self, key):
+        digest = key_hash(key)
+        self._set(digest)
+        self._log.write(digest)
+        self.entries += 1
+
+    def _set(self, digest):
+        for position in self._positions(digest):
+            index = HEADER.size + (position >> 3)
+            self._map[index] |= 1 << (position & 7)
+
+    def draw_unseen(self, draw, key=str, attempts=20):
+        """
+        Call `draw()` until it returns a candidate whose key was never recorded.
+
+        Args:
+            draw (callable): Returns a new random candidate.
+            key (callable, optional): Maps a candidate to its history key. Defaults to `str`.
+            attempts (int, optional): How many candidates to try before giving up and
+            accepting a repeat, so a theme whose combinations are used up still works.
+            Defaults to 20.
+
+        Returns:
+            The accepted candidate, recorded in the history unless it is a repeat.
+        """
+        for _ in range(attempts):
+            candidate = draw()
+            candidate_key = key(candidate)
+            if candidate_key not in self:
+                self.add(candidate_key)
+                break
+        return candidate
+
+    def flush(self):
+        struct.pack_into("<Q", self._map, HEADER.size - 8, self.entries)
+        self._map.flush()
+        self._log.flush()
+
+    def close(self):
+        self.flush()
+        self._map.close()
+        self._file.close()
+        self._log.close()
+
+    def __len__(self):
+        return self.entries
+
+
+def rebuild(
+    filter_path=DEFAULT_FILTER_PATH,
+    log_path=DEFAULT_LOG_PATH,
+    capacity=20000000,
+    error_rate=0.01,
+):
+    """
+    Replace the Bloom filter with a new one filled from the log.
+
+    Use it to grow the filter when the number of entries approaches its capacity.
+
+    Returns:
+        int: The number of entries replayed.
+    """
+    if os.path.exists(filter_path):
+        os.remove(filter_path)
+    history = History(filter_path, os.devnull, capacity, error_rate)
+    with open(log_path, "rb") as log:
+        while True:
+            block = log.read(16 * 65536)
+            if not block:
+                break
+            for offset in range(0, len(block), 16):
+                history._set(block[offset : offset + 16])
+                history.entries += 1
+    entries = history.entries
+    history.close()
+    return entries
+
+
+if __name__ == "__main__":
+    import sys
+
+    capacity = int(sys.argv[1]) if len(sys.argv) > 1 else 20000000
+    print(f"replayed {rebuild(capacity=capacity)} entries")
@@ -0,0 +1,141 @@
+"""
+Watches the theme word lists and icon folders, so new content shows up without a restart.
+
+A `ContentWatcher` thread scans data/*.json and the PNG files of every icons/ folder
+once per interval and compares their sizes and modification times with the previous
+scan. Only the files that changed are read again: a changed JSON file is parsed on the
+watcher thread, and a changed icon folder is only named, since its icons are decoded
+again on first use. The changes are handed to a callback, which in the app posts them
+to the pygame event queue, so the UI thread applies them between two frames:
+
+    changes = {
+        "data": {"monsters.json": {...parsed JSON...}, "old.json": None},  # None: removed
+        "icons": ["Monsters"],  # icon folders whose PNG files or pack changed
+    }
+
+Polling keeps the watcher portable and free of dependencies; a scan of a few hundred
+files takes well under a millisecond.
+"""
+
+import os
+import json
+import threading
+
+from iconpack import SUFFIX
+
+
+def _scan_files(folder, suffix):
+    """
+    Return {file name: (size, modification time)} of the files in a folder with a suffix.
+    """
+    files = {}
+    try:
+        with os.scandir(folder) as entries:
+            for entry in entries:
+                if entry.name.endswith(suffix) and entry.is_file():
+                    stat = entry.stat()
+                    files[entry.name] = (stat.st_size, stat.st_mtime_ns)
+    except FileNotFoundError:
+        pass
+    return files
+
+
+# ContentWatcher class
+class ContentWatcher:
+    """
+    A thread that reports added, changed and removed theme files and icons.
+
+    Args:
+        notify (callable): Called on the watcher thread with the changes of a scan, see
+        the module docstring; never called with empty changes.
+        data_dir (str, optional): The folder holding the theme JSON files. Defaults to "data".
+        icons_dir (str, optional): The folder holding one icon folder per theme.
+        Defaults to "icons".
+        interval (float, optional): Seconds between two scans. Defaults to 1.
+
+    Methods:
+        poll(): Scan once and return the changes since the previous scan.
+        close(): Stop the thread.
+
+    A JSON file that does not parse, e.g. because an editor is still writing it, is not
+    reported and is read again on the next scan.
+
+    Example:
+        watcher = ContentWatcher(print, interval=0.5)
+        ...
+        watcher.close()
+    """
+
+    def __init__(self, notify, data_dir="data", icons_dir="icons", interval=1.0):
+        self.notify = notify
+        self.data_dir = data_dir
+        self.icons_dir = icons_dir
+        self.interval = interval
+        self.errors = []
+        self._data = None  # Result of the previous scan, taken on the thread
+        self._icons = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _scan_icons(self):
+        # A folder's icon pack counts as one more file of the folder
+        packs = _scan_files(self.icons_dir, SUFFIX)
+        folders = {}
+        for name, stat in packs.items():
+            folders[name[: -len(SUFFIX)]] = {name: stat}
+        try:
+            with os.scandir(self.icons_dir) as entries:
+                for entry in entries:
+                    if entry.is_dir():
+                        files = folders.setdefault(entry.name, {})
+                        files.update(_scan_files(entry.path, ".png"))
+        except FileNotFoundError:
+            pass
+        return folders
+
+    def poll(self):
+        data = _scan_files(self.data_dir, ".json")
+        icons = self._scan_icons()
+        if self._data is None:  # First scan, everything is already loaded
+            self._data, self._icons = data, icons
+            return {}
+
+        changes = {}
+        for name in self._data.keys() | data.keys():
+            if self._data.get(name) == data.get(name):
+                continue
+            if name not in data:
+                changes.setdefault("data", {})[name] = None
+                continue
+            try:
+                with open(os.path.join(self.data_dir, name), encoding="utf-8") as file:
+                    changes.setdefault("data", {})[name] = json.load(file)
+            except (OSError, ValueError):
+                data[name] = self._data.get(name)  # Half written, look again next scan
+                if data[name] is None:
+                    del data[name]
+        folders = [
+            folder
+            for folder in sorted(self._icons.keys() | icons.keys())
+            if self._icons.get(folder) != icons.get(folder)
+        ]
+        if folders:
+            changes["icons"] = folders
+        self._data, self._icons = data, icons
+        return changes
+
+    def _run(self):
+        while True:
+            try:
+                changes = self.poll()
+                if changes:
+                    self.notify(changes)
+            except OSError as error:  # Keep watching, e.g. while a folder is renamed
+                self.errors.append(error)
+            if self._stop.wait(self.interval):
+                return
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
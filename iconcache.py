@@ -0,0 +1,208 @@
+import random
+from collections import OrderedDict
+
+import pygame
+
+from iconpack import IconPack, open_pack
+from storyseeds import icon_files, icon_folder, pick_icons
+
+
+def _pixel_bytes(icons):
+    return sum(
+        surface.get_bytesize() * surface.get_width() * surface.get_height()
+        for surface, _ in icons
+    )
+
+
+# IconCache class
+class IconCache:
+    """
+    A cache of decoded, display-format icon surfaces grouped by theme.
+
+    Args:
+        memory_budget (int, optional): The number of bytes of pixel data the cache may
+        hold. Defaults to 64 MiB.
+        icons_dir (str, optional): The root folder holding one sub-folder per theme.
+        Defaults to "icons".
+
+    Attributes:
+        memory_used (int): The number of bytes of pixel data currently held.
+        loads (int): The number of themes loaded from disk.
+        evictions (int): The number of themes evicted to stay under the budget.
+
+    Methods:
+        icons(theme): Return every (surface, path) pair of a theme, loading it if needed.
+        sample(theme, num_icons, rng=random): Return a random selection of icons.
+        find(theme, paths): Return the icons of a theme with the given paths.
+        invalidate(theme=None): Forget one theme, or all of them.
+        loaded(theme): Return whether a theme's icons are in memory.
+        decode(theme): Decode a theme's icons without caching them, from any thread.
+        adopt(theme, folder, icons, size): Cache icons returned by `decode`.
+
+    A theme's folder is globbed and decoded once; every later request is answered from
+    memory, so picking icons is a random index pick without disk I/O. When a display
+    mode is set the surfaces are converted to the display pixel format so blitting them
+    needs no per-frame conversion. Themes are kept in least-recently-used order and the
+    oldest ones are evicted when the budget is exceeded, but the theme in use is always
+    kept.
+
+    A folder packed with `iconextractor.py --pack` is read from its icon pack instead:
+    one memory-mapped file is opened rather than every PNG, and icons are expanded to
+    surfaces as they are picked (see `iconpack.IconPack`). Such a theme is counted
+    with the size of its pack plus the icons expanded so far, and its pack is closed
+    when the theme is evicted or invalidated.
+
+    Example:
+        cache = IconCache(memory_budget=32 * 1024 * 1024)
+        random_icons = cache.sample("Monsters", 5)
+    """
+
+    def __init__(self, memory_budget=64 * 1024 * 1024, icons_dir="icons"):
+        self.memory_budget = memory_budget
+        self.icons_dir = icons_dir
+        self.loads = 0
+        self.evictions = 0
+        self._themes = OrderedDict()  # folder -> (list of (surface, path), size)
+        self._folders = {}  # theme -> folder, so lookups skip the filesystem
+
+    @property
+    def memory_used(self):
+        # Packs grow as their icons are expanded, so their size is read when asked for
+        return sum(
+            size + icons.expanded_bytes if isinstance(icons, IconPack) else size
+            for icons, size in self._themes.values()
+        )
+
+    def _folder(self, theme):
+        folder = self._folders.get(theme)
+        if folder is None:
+            folder = self._folders[theme] = icon_folder(theme, self.icons_dir)
+        return folder
+
+    def icons(self, theme):
+        folder = self._folder(theme)
+        entry = self._themes.get(folder)
+        if entry is None:
+            entry = self._load(folder)
+            self._themes[folder] = entry
+        else:
+            self._themes.move_to_end(folder)
+        # Also makes room for the icons expanded since the last call
+        self._evict(keep=folder)
+        return entry[0]
+
+    def loaded(self, theme):
+        # Themes without a folder of their own share the fallback folder's entry
+        return self._folder(theme) in self._themes
+
+    def decode(self, theme):
+        """
+        Decode the icons of a theme without touching the cache, e.g. on a worker thread.
+
+        Returns:
+            tuple: (folder, icons, size), to be handed to `adopt` on the main thread,
+            where the surfaces are converted to the display format.
+        """
+        folder = self._folder(theme)
+        pack = open_pack(folder, self.icons_dir)
+        if pack is not None:
+            return folder, pack, pack.nbytes
+        icons = [
+            (pygame.image.load(path), path)
+            for path in icon_files(folder, self.icons_dir)
+        ]
+        return folder, icons, _pixel_bytes(icons)
+
+    def adopt(self, theme, folder, icons, size):
+        """
+        Cache icons decoded by `decode`, converting them when a display mode is set.
+        """
+        self._folders[theme] = folder
+        if folder in self._themes:  # Loaded on the main thread in the meantime
+            if isinstance(icons, IconPack):
+                icons.close()
+            return
+        # Packs convert every icon when it is expanded
+        if pygame.display.get_surface() is not None and not isinstance(icons, IconPack):
+            icons = [(surface.convert_alpha(), path) for surface, path in icons]
+            size = _pixel_bytes(icons)
+        self._themes[folder] = (icons, size)
+        self.loads += 1
+        self._evict(keep=folder)
+
+    def sample(self, theme, num_icons=5, rng=random):
+        icons = pick_icons(self.icons(theme), num_icons, rng)
+        self._evict(keep=self._folder(theme))  # The picked icons may have been expanded
+        return icons
+
+    def find(self, theme, paths):
+        """
+        Return {path: (surface, path)} for those of `paths` that are icons of a theme.
+
+        Only the icons found are expanded when the theme is read from a pack, e.g. when a
+        saved board is opened.
+        """
+        icons = self.icons(theme)
+        if isinstance(icons, IconPack):
+            theme_paths = icons.paths
+        else:
+            theme_paths = [path for _, path in icons]
+        paths = set(paths)
+        return {path: icons[i] for i, path in enumerate(theme_paths) if path in paths}
+
+    def invalidate(self, theme=None):
+        """
+        Forget the cached icons of a theme, or of every theme when `theme` is omitted.
+
+        Themes that fell back to the folder being forgotten are resolved again on their
+        next use, so a newly created folder is picked up.
+        """
+        if theme is None:
+            for folder in list(self._themes):
+                self._drop(folder)
+            self._folders.clear()
+            return
+        for name, folder in list(self._folders.items()):
+            if theme in (name, folder):
+                del self._folders[name]
+        if theme in self._themes:
+            self._drop(theme)
+
+    def stats(self):
+        return {
+            "themes": list(self._themes),
+            "memory_used": self.memory_used,
+            "memory_budget": self.memory_budget,
+            "loads": self.loads,
+            "evictions": self.evictions,
+        }
+
+    def _load(self, folder):
+        pack = open_pack(folder, self.icons_dir)
+        if pack is not None:
+            self.loads += 1
+            return pack, pack.nbytes
+        # Only convert when a display exists, convert() fails without a video mode
+        convert = pygame.display.get_surface() is not None
+        icons = []
+        for path in icon_files(folder, self.icons_dir):
+            surface = pygame.image.load(path)
+            if convert:
+                surface = surface.convert_alpha()
+            icons.append((surface, path))
+        self.loads += 1
+        return icons, _pixel_bytes(icons)
+
+    def _evict(self, keep):
+        while self.memory_used > self.memory_budget and len(self._themes) > 1:
+            folder = next(iter(self._themes))
+            if folder == keep:
+                self._themes.move_to_end(folder)
+                continue
+            self._drop(folder)
+            self.evictions += 1
+
+    def _drop(self, folder):
+        icons, _ = self._themes.pop(folder)
+        if isinstance(icons, IconPack):
+            icons.close()
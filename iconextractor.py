@@ -1,86 +1,291 @@
-from PIL import Image
-import numpy as np
-import os
-import glob
-import sys
-
-print("this will duplicate icons, so make sure you understand the code")
-
-sys.exit()
-
-"""
-This looks for all *.png in the sources directory
-These pngs are expected to be icon sheets (32 or so icons per sheet)
-Icons are expected to be about 91 pixels square and black and white
-
-The script separates them into individual icons automatically
-You do not need to run this script, but it is one I used to separate icons
-"""
-
-# Function to find the next available index for the icon files
-def find_next_icon_index():
-    existing_icons = glob.glob('./icon_*.png')
-    if not existing_icons:
-        return 1  # Start from 1 if no icons exist
-    highest_index = max(int(os.path.splitext(os.path.basename(icon))[0].split('_')[-1]) for icon in existing_icons)
-    return highest_index + 1
-
-# Function to load the image and convert it to a binary array representing the icons
-def load_image(file_path):
-    img = Image.open(file_path)
-    gray_img = img.convert('L')
-    inv_img_array = 255 - np.array(gray_img)
-    binary_threshold = 128
-    binary_img_array = inv_img_array > binary_threshold
-    return binary_img_array, img
-
-# Function to find the continuous blocks where black squares are present
-def find_blocks(arr, min_size=20):
-    blocks = []
-    start = None
-    for i, val in enumerate(arr):
-        if val > 0 and start is None:
-            start = i
-        elif val == 0 and start is not None:
-            if i - start >= min_size:
-                blocks.append((start, i))
-            start = None
-    if start is not None and len(arr) - start >= min_size:
-        blocks.append((start, len(arr)))
-    return blocks
-
-# Function to crop icons from the detected row and column blocks
-def crop_icons_from_blocks(image, row_blocks, col_blocks):
-    icons = []
-    icon_paths = []
-    icon_index = find_next_icon_index()  # Get the starting index for this batch of icons
-    for row_block in row_blocks:
-        for col_block in col_blocks:
-            left, right = col_block
-            upper, lower = row_block
-            icon = image.crop((left, upper, right, lower))
-            icon_path = f'./icon_{icon_index:08d}.png'  # Save icons with padded numbering
-            icon.save(icon_path)
-            icons.append(icon)
-            icon_paths.append(icon_path)
-            icon_index += 1  # Increment the index for the next icon
-    return icons, icon_paths
-
-# Function to process a single image
-def process_image(file_path):
-    binary_img_array, img = load_image(file_path)
-    sum_rows = np.sum(binary_img_array, axis=1)
-    sum_cols = np.sum(binary_img_array, axis=0)
-    row_blocks = find_blocks(sum_rows)
-    col_blocks = find_blocks(sum_cols)
-    cropped_icons, cropped_icon_paths = crop_icons_from_blocks(img, row_blocks, col_blocks)
-    return cropped_icon_paths
-
-# Get a list of all .png files in the 'sources' subfolder
-source_images = glob.glob('./sources/*.png')
-
-# Process each source image
-all_cropped_icon_paths = []
-for image_path in source_images:
-    cropped_icon_paths = process_image(image_path)
-    all_cropped_icon_paths.extend(cropped_icon_paths)
+"""
+This looks for all *.png in the sources directory
+These pngs are expected to be icon sheets (32 or so icons per sheet)
+Icons are expected to be about 91 pixels square and black and white
+
+The script separates them into individual icons automatically
+You do not need to run this script, but it is one I used to separate icons
+
+Sheets are detected and cut in a pool of worker processes. The icon numbers are
+allocated once up front, so workers never have to look at the output folder.
+
+Every icon already in icons/ (and every icon cut earlier) is indexed by a perceptual
+hash stored in icons/phash_index.json. A new icon whose hash is within a few bits of
+an indexed one is reported as a near-duplicate and not saved. The index only rehashes
+files that were added or changed since the last run.
+
+    python iconextractor.py --run                    # cut sheets, skip near-duplicates
+    python iconextractor.py --run --keep-duplicates  # cut everything, only report
+    python iconextractor.py --dry-run                # only detect, report sheets per second
+    python iconextractor.py --pack                   # pack every icons/ folder, see iconpack.py
+
+Packing writes the binarized icons of every theme folder under icons/ into a single
+1-bit icon pack per theme, which storymaker.py reads instead of the PNG files.
+"""
+import argparse
+import json
+import multiprocessing
+import time
+from PIL import Image
+import numpy as np
+import os
+import glob
+import sys
+
+from iconpack import pack_path, write_pack
+
+# Function to find the next available index for the icon files
+def find_next_icon_index():
+    existing_icons = glob.glob('./icon_*.png')
+    if not existing_icons:
+        return 1  # Start from 1 if no icons exist
+    highest_index = max(int(os.path.splitext(os.path.basename(icon))[0].split('_')[-1]) for icon in existing_icons)
+    return highest_index + 1
+
+# Function to load the image and convert it to a binary array representing the icons
+def load_image(file_path):
+    img = Image.open(file_path)
+    gray_img = img.convert('L')
+    inv_img_array = 255 - np.array(gray_img)
+    binary_threshold = 128
+    binary_img_array = inv_img_array > binary_threshold
+    return binary_img_array, img
+
+# Function to find the continuous blocks where black squares are present
+def find_blocks(arr, min_size=20):
+    # Pad with empty cells so every run has a rising and a falling edge, then find the
+    # edges with one diff instead of walking the sums element by element
+    filled = np.concatenate(([0], np.asarray(arr) > 0, [0])).astype(np.int8)
+    edges = np.diff(filled)
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1)
+    keep = ends - starts >= min_size
+    return list(zip(starts[keep].tolist(), ends[keep].tolist()))
+
+# Where the perceptual hash index lives, and which icons it covers
+INDEX_PATH = './icons/phash_index.json'
+INDEXED_ICONS = ['./icons/*/*.png', './icon_*.png']
+HASH_DISTANCE = 4  # Icons whose hashes differ in at most this many bits are near-duplicates
+
+# Function to compute the difference hash of a binarized icon
+def difference_hash(binary_array):
+    """
+    Compute a 64-bit difference hash (dHash) of a binarized icon.
+
+    The icon is shrunk to 8 rows of 9 cells by averaging, then every bit records whether
+    a cell is darker than its right-hand neighbour. Small shifts, scaling and noise
+    change only a few bits, so near-identical icons get hashes a short Hamming
+    distance apart.
+    """
+    height, width = binary_array.shape
+    row_edges = np.linspace(0, height, 9).astype(int)[:-1]
+    col_edges = np.linspace(0, width, 10).astype(int)[:-1]
+    cells = np.add.reduceat(binary_array.astype(np.float32), row_edges, axis=0)
+    cells = np.add.reduceat(cells, col_edges, axis=1)
+    cells /= np.outer(np.diff(np.append(row_edges, height)), np.diff(np.append(col_edges, width)))
+    bits = (cells[:, 1:] > cells[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+# Function to count the set bits of every value in a uint64 array
+def popcount64(values):
+    values = values - ((values >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    values = (values & np.uint64(0x3333333333333333)) + ((values >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    values = (values + (values >> np.uint64(4))) & np.uint64(0x0F0F0F0F0F0F0F0F)
+    return (values * np.uint64(0x0101010101010101)) >> np.uint64(56)
+
+class HashIndex:
+    """
+    A persistent index of icon perceptual hashes with a fast near-duplicate lookup.
+
+    Args:
+        path (str): The JSON file the index is kept in.
+
+    Methods:
+        refresh(patterns): Hash icons that are new or changed, and drop deleted ones.
+        nearest(icon_hash): Return the closest indexed icon and its distance in bits.
+        add(path, icon_hash): Add a newly saved icon.
+        save(): Write the index back to disk.
+
+    Every entry stores the file's size and modification time next to its hash, so
+    re-runs only rehash files that changed. Lookups XOR the query against all hashes
+    at once and count the differing bits with NumPy.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = path
+        self.entries = {}  # path -> [size, mtime, hash]
+        if os.path.exists(path):
+            with open(path) as file:
+                self.entries = json.load(file)['icons']
+        self._hashes = None
+
+    def refresh(self, patterns=INDEXED_ICONS):
+        found = set()
+        for pattern in patterns:
+            for icon_path in glob.glob(pattern):
+                icon_path = icon_path.replace(os.sep, '/')
+                found.add(icon_path)
+                stat = os.stat(icon_path)
+                entry = self.entries.get(icon_path)
+                if entry is None or entry[:2] != [stat.st_size, stat.st_mtime]:
+                    binary_img_array, _ = load_image(icon_path)
+                    self.entries[icon_path] = [stat.st_size, stat.st_mtime, difference_hash(binary_img_array)]
+        for icon_path in set(self.entries) - found:
+            del self.entries[icon_path]
+        self._hashes = None
+
+    def nearest(self, icon_hash):
+        if not self.entries:
+            return None, 65
+        if self._hashes is None:
+            self._paths = list(self.entries)
+            self._hashes = np.array([self.entries[p][2] for p in self._paths], dtype=np.uint64)
+        distances = popcount64(self._hashes ^ np.uint64(icon_hash))
+        best = int(np.argmin(distances))
+        return self._paths[best], int(distances[best])
+
+    def add(self, icon_path, icon_hash):
+        # Icons that are not saved yet get no size and mtime, refresh() rehashes them
+        if os.path.exists(icon_path):
+            stat = os.stat(icon_path)
+            size, mtime = stat.st_size, stat.st_mtime
+        else:
+            size = mtime = None
+        self.entries[icon_path.replace(os.sep, '/')] = [size, mtime, icon_hash]
+        self._hashes = None
+
+    def save(self):
+        with open(self.path, 'w') as file:
+            json.dump({'version': 1, 'icons': self.entries}, file)
+
+# Function to detect the icons of a sheet and hash each of them
+def detect_icons(file_path):
+    """
+    Find the icon boxes of a sheet and compute the perceptual hash of each icon.
+
+    Returns:
+        tuple: The sheet path and a list of ((left, upper, right, lower), hash) pairs,
+        in row order.
+    """
+    binary_img_array, img = load_image(file_path)
+    sum_rows = np.sum(binary_img_array, axis=1)
+    sum_cols = np.sum(binary_img_array, axis=0)
+    row_blocks = find_blocks(sum_rows)
+    col_blocks = find_blocks(sum_cols)
+    icons = []
+    for upper, lower in row_blocks:
+        for left, right in col_blocks:
+            icon_hash = difference_hash(binary_img_array[upper:lower, left:right])
+            icons.append(((left, upper, right, lower), icon_hash))
+    return file_path, icons
+
+# Function to crop icons from the detected boxes and save them
+def crop_icons_from_blocks(job):
+    """
+    Crop the given boxes out of a sheet and save each one to its assigned path.
+
+    Args:
+        job (tuple): The sheet path and a list of (box, icon_path) pairs.
+    """
+    file_path, boxes = job
+    image = Image.open(file_path)
+    for box, icon_path in boxes:
+        image.crop(box).save(icon_path)
+    return [icon_path for _, icon_path in boxes]
+
+# Function to pick the icons to keep and give each one its file name
+def allocate_icons(detected, index, keep_duplicates=False):
+    """
+    Drop near-duplicates and number the remaining icons, all in one pass.
+
+    The next free icon number is looked up once, and every kept icon gets the next
+    number in sheet order, so workers can save their icons independently. Kept icons
+    are added to the index straight away, so repeats within the run are caught too.
+
+    Returns:
+        list: (sheet path, [(box, icon_path), ...]) jobs for `crop_icons_from_blocks`.
+    """
+    icon_index = find_next_icon_index()  # Get the starting index for this run
+    jobs = []
+    for file_path, icons in detected:
+        boxes = []
+        for box, icon_hash in icons:
+            match, distance = index.nearest(icon_hash)
+            if distance <= HASH_DISTANCE:
+                print(f"near-duplicate of {match} ({distance} bits) in {file_path} at {box}")
+                if not keep_duplicates:
+                    continue
+            icon_path = f'./icon_{icon_index:08d}.png'  # Save icons with padded numbering
+            index.add(icon_path, icon_hash)
+            boxes.append((box, icon_path))
+            icon_index += 1  # Increment the index for the next icon
+        jobs.append((file_path, boxes))
+    return jobs
+
+# Function to pack the icons of every theme folder into one icon pack per theme
+def pack_icon_folders(icons_dir='./icons'):
+    """
+    Write icons/<theme>.iconpack for every theme folder, from the binarized PNG files.
+
+    Returns:
+        list: (folder, icon count, PNG bytes, pack bytes) per packed folder.
+    """
+    packed = []
+    for folder in sorted(os.listdir(icons_dir)):
+        if not os.path.isdir(os.path.join(icons_dir, folder)):
+            continue
+        # Same order as storyseeds.icon_files, so an icon index means the same icon
+        icon_paths = sorted(glob.glob(os.path.join(icons_dir, folder, '*.png')))
+        icons = [(os.path.basename(icon_path), load_image(icon_path)[0]) for icon_path in icon_paths]
+        size = write_pack(pack_path(folder, icons_dir), icons)
+        packed.append((folder, len(icons), sum(os.path.getsize(p) for p in icon_paths), size))
+    return packed
+
+def main():
+    parser = argparse.ArgumentParser(description='Cut icon sheets in ./sources into single icons.')
+    parser.add_argument('--run', action='store_true', help='actually cut the sheets')
+    parser.add_argument('--keep-duplicates', action='store_true', help='save near-duplicates too, only report them')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--dry-run', action='store_true', help='only detect and hash icons, report sheets per second')
+    parser.add_argument('--pack', action='store_true', help='pack every icons/ folder into a 1-bit icon pack')
+    args = parser.parse_args()
+
+    if args.pack:
+        for folder, count, png_bytes, pack_bytes in pack_icon_folders():
+            print(f"{folder}: {count} icons, {png_bytes} bytes of PNG -> {pack_bytes} bytes packed")
+        return
+
+    if not args.run and not args.dry_run:
+        print("this cuts every sheet in ./sources into icons, so make sure you understand the code")
+        print("pass --run to go ahead, or --dry-run to only measure")
+        sys.exit()
+
+    # Get a list of all .png files in the 'sources' subfolder
+    source_images = sorted(glob.glob('./sources/*.png'))
+
+    with multiprocessing.Pool(args.workers) as pool:
+        # Detect and hash the icons of every sheet in parallel
+        start = time.perf_counter()
+        detected = pool.map(detect_icons, source_images)
+        elapsed = time.perf_counter() - start
+        found = sum(len(icons) for _, icons in detected)
+        print(f"{len(source_images)} sheets, {found} icons in {elapsed:.2f}s "
+              f"({len(source_images) / max(elapsed, 1e-9):.1f} sheets/s)")
+        if args.dry_run:
+            return
+
+        # Bring the hash index up to date, only new or changed icons are hashed
+        index = HashIndex()
+        index.refresh()
+
+        # Number the icons to keep once, then crop and save them in parallel
+        jobs = allocate_icons(detected, index, args.keep_duplicates)
+        all_cropped_icon_paths = [path for paths in pool.map(crop_icons_from_blocks, jobs) for path in paths]
+        for icon_path in all_cropped_icon_paths:
+            index.add(icon_path, index.entries[icon_path][2])  # Record size and mtime
+        print(f"saved {len(all_cropped_icon_paths)} icons")
+
+    index.save()
+
+if __name__ == "__main__":
+    main()
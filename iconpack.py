@@ -0,0 +1,202 @@
+"""
+Packed 1-bit icon files: every icon of a theme folder in one file, read through a memory map.
+
+The icons are black and white, so one bit per pixel holds everything the board shows.
+iconextractor.py writes one pack per icon folder next to it:
+
+    python iconextractor.py --pack     # icons/Medieval/*.png -> icons/Medieval.iconpack
+
+The PNG files stay the editable source and are still what HTML saves link to; a pack is
+only used while it is newer than its folder, so adding or removing icons falls back to
+the PNG files until the folder is packed again (like data/wordbank.bin and the JSON
+files). An icon rewritten in place does not change the folder, pack again after that.
+
+File layout (little-endian):
+    header      magic, version, icon count (4s, uint32, uint32)
+    index       per icon: width, height, bitmap offset and length, name offset and
+                length (uint16, uint16, uint32, uint32, uint32, uint16)
+    names       the UTF-8 file names back to back
+    bitmaps     per icon its zlib-compressed rows, 8 pixels per byte with the leftmost
+                pixel in the highest bit and every row padded to a whole byte; a set
+                bit is black
+
+Opening a pack reads nothing but the index. An icon is expanded into a surface the
+first time it is used and kept from then on, so only the icons that were shown take up
+surface memory.
+"""
+
+import os
+import mmap
+import zlib
+import struct
+from collections.abc import Sequence
+
+import pygame
+
+MAGIC = b"ICPK"
+VERSION = 1
+HEADER = struct.Struct("<4sII")  # magic, version, icon count
+# Width, height, bitmap offset and length, name offset and length
+ENTRY = struct.Struct("<HHIIIH")
+SUFFIX = ".iconpack"
+
+# The 8 RGB pixels of every possible bitmap byte
+_BLACK, _WHITE = b"\x00\x00\x00", b"\xff\xff\xff"
+_EXPAND = [
+    b"".join(_BLACK if byte & (0x80 >> bit) else _WHITE for bit in range(8))
+    for byte in range(256)
+]
+
+
+def pack_path(folder, icons_dir="icons"):
+    """
+    Return the pack file of an icon folder, e.g. "icons/Medieval.iconpack".
+    """
+    return os.path.join(icons_dir, folder + SUFFIX)
+
+
+def write_pack(path, icons):
+    """
+    Write a pack file.
+
+    Args:
+        path (str): The pack file, see `pack_path`.
+        icons (list): (file name, bitmap) pairs in index order, every bitmap a 2D NumPy
+        bool array that is True for black pixels.
+
+    Returns:
+        int: The size of the file in bytes.
+
+    On Windows a pack cannot be replaced while a running app has it mapped.
+    """
+    import numpy as np  # Only needed to write packs, i.e. by iconextractor.py
+
+    names = [name.encode("utf-8") for name, _ in icons]
+    bitmaps = [
+        zlib.compress(np.packbits(bitmap, axis=1).tobytes(), 9) for _, bitmap in icons
+    ]
+    names_start = HEADER.size + ENTRY.size * len(icons)
+    bitmaps_start = names_start + sum(len(name) for name in names)
+
+    parts = [HEADER.pack(MAGIC, VERSION, len(icons))]
+    name_offset, bitmap_offset = names_start, bitmaps_start
+    for (_, bitmap), name, bits in zip(icons, names, bitmaps):
+        height, width = bitmap.shape
+        parts.append(
+            ENTRY.pack(width, height, bitmap_offset, len(bits), name_offset, len(name))
+        )
+        name_offset += len(name)
+        bitmap_offset += len(bits)
+    parts.extend(names)
+    parts.extend(bitmaps)
+
+    # Write to a temporary file first so a running app never maps a half-written pack
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(b"".join(parts))
+    os.replace(temp_path, path)
+    return bitmap_offset
+
+
+def open_pack(folder, icons_dir="icons"):
+    """
+    Return the `IconPack` of an icon folder, or None when it has no pack, the folder
+    changed since it was packed or the pack cannot be read, e.g. because it is empty or
+    truncated; the PNG files are used then.
+    """
+    path = pack_path(folder, icons_dir)
+    try:
+        if os.path.getmtime(path) < os.path.getmtime(os.path.join(icons_dir, folder)):
+            return None
+        return IconPack(path, os.path.join(icons_dir, folder))
+    except (ValueError, struct.error, OSError):
+        return None
+
+
+# IconPack class
+class IconPack(Sequence):
+    """
+    The icons of a pack file as a sequence of (surface, path) pairs, expanded on demand.
+
+    Args:
+        path (str): The pack file written by `write_pack`.
+        folder (str): The icon folder it was packed from, used to build the icon paths.
+
+    Attributes:
+        paths (list): The path of every icon, as `storyseeds.icon_files` lists them.
+        nbytes (int): The size of the pack in bytes.
+        expanded_bytes (int): The pixel bytes of the icons expanded so far.
+
+    A pack can be used wherever the list of decoded icons was used: `len(pack)`,
+    `pack[i]` and iterating all work, and `storyseeds.pick_icons` samples from it. When
+    a display mode is set, expanded icons are converted to its pixel format.
+
+    Raises:
+        ValueError: If the file is empty, not a pack or truncated.
+        struct.error: If the file ends inside its header or index.
+
+    Example:
+        pack = IconPack("icons/Medieval.iconpack", "icons/Medieval")
+        surface, path = pack[0]
+    """
+
+    def __init__(self, path, folder):
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_index(path, folder)
+        except Exception:
+            self._map.close()
+            raise
+        self.nbytes = len(self._map)
+        self._surfaces = [None] * len(self._entries)
+        self.expanded_bytes = 0
+
+    def _read_index(self, path, folder):
+        magic, version, count = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} icon pack")
+        self._entries = [
+            ENTRY.unpack_from(self._map, HEADER.size + i * ENTRY.size)
+            for i in range(count)
+        ]
+        size = len(self._map)
+        for _, _, offset, length, start, name_length in self._entries:
+            if offset + length > size or start + name_length > size:
+                raise ValueError(f"{path} is truncated")
+        self.paths = [
+            os.path.join(folder, self._map[start : start + length].decode("utf-8"))
+            for _, _, _, _, start, length in self._entries
+        ]
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __getitem__(self, index):
+        surface = self._surfaces[index]
+        if surface is None:
+            surface = self._surfaces[index] = self._expand(index)
+            self.expanded_bytes += (
+                surface.get_bytesize() * surface.get_width() * surface.get_height()
+            )
+        return surface, self.paths[index]
+
+    def _expand(self, index):
+        width, height, offset, length, _, _ = self._entries[index]
+        stride = (width + 7) // 8
+        bits = zlib.decompress(self._map[offset : offset + length])
+        pixels = b"".join(map(_EXPAND.__getitem__, bits))
+        surface = pygame.image.frombytes(pixels, (stride * 8, height), "RGB")
+        if stride * 8 != width:
+            surface = surface.subsurface((0, 0, width, height)).copy()
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert()  # Opaque, so no per-pixel alpha is needed
+        return surface
+
+    def close(self):
+        """
+        Unmap the file and drop the expanded icons; surfaces handed out stay valid.
+        """
+        self._map.close()
+        self._surfaces = [None] * len(self._entries)
+        self.expanded_bytes = 0
@@ -0,0 +1,154 @@
+"""
+Background preparation of the next story board, so Generate and theme clicks do not wait.
+
+Generating a board on the UI thread means reading the theme's word lists and, the first
+time a theme is used, globbing and decoding its whole icon folder, which freezes the
+window for a visible moment on slow disks. A `BoardPrefetcher` does that work on a small
+thread pool instead:
+
+    prepare(theme)   starts preparing a board of a theme: random phrase candidates
+                     (word indexes) and, unless they are cached already, the decoded
+                     icons of the theme
+    take(theme)      hands over what was prepared, waiting only for a job still running
+
+The app prepares the next board of the current theme after every board it shows, and
+the board of a theme whose button the pointer hovers, so the click that follows finds
+it ready. Everything that touches pygame's display or the history stays on the main
+thread: `take` converts the decoded icons to the display format when it caches them,
+and the phrase candidates are only checked against the history when they are used.
+"""
+
+import random
+import struct
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+from iconpack import IconPack
+from storyseeds import DEFAULT_CATEGORIES
+
+
+def _close_unused(future):
+    """
+    Close the icon pack opened by a job whose board is dropped, once the job is over.
+    """
+    if future.cancelled() or future.exception() is not None:
+        return
+    _, decoded = future.result()
+    if decoded is not None and isinstance(decoded[1], IconPack):
+        decoded[1].close()
+
+
+# BoardPrefetcher class
+class BoardPrefetcher:
+    """
+    Prepares boards of themes on worker threads ahead of their use.
+
+    Args:
+        icon_cache (IconCache): The cache the decoded icons are handed to.
+        word_bank (WordBank): The word lists of every theme.
+        categories (list, optional): The categories joined to build each phrase.
+        num_phrases (int, optional): The number of phrases on a board. Defaults to 5.
+        spares (int, optional): Phrase candidates drawn per phrase, so candidates the
+        history rejects can be replaced without drawing on the main thread. Defaults to 3.
+        max_jobs (int, optional): The number of prepared boards kept; the oldest is
+        dropped when the pointer sweeps over more theme buttons. Defaults to 4.
+        workers (int, optional): The number of worker threads. Defaults to 2.
+
+    Methods:
+        prepare(theme): Start preparing a board of a theme, unless one is on its way.
+        take(theme): Cache the prepared icons and return the phrase candidates.
+        discard(theme=None): Drop the prepared board of a theme, or all of them.
+        close(): Stop the worker threads.
+
+    Example:
+        prefetcher = BoardPrefetcher(icon_cache, word_bank)
+        prefetcher.prepare("Medieval")
+        ...
+        candidates = prefetcher.take("Medieval")  # [(3, 14, 15), (9, 2, 6), ...]
+        icons = icon_cache.sample("Medieval", 5)  # Served from memory
+    """
+
+    def __init__(
+        self,
+        icon_cache,
+        word_bank,
+        categories=DEFAULT_CATEGORIES,
+        num_phrases=5,
+        spares=3,
+        max_jobs=4,
+        workers=2,
+    ):
+        self.icon_cache = icon_cache
+        self.word_bank = word_bank
+        self.categories = list(categories)
+        self.num_candidates = num_phrases * spares
+        self.max_jobs = max_jobs
+        self.hits = 0  # Boards taken from a finished job
+        self.waits = 0  # Boards taken from a job that was still running
+        self._executor = ThreadPoolExecutor(workers, thread_name_prefix="prefetch")
+        self._jobs = OrderedDict()  # theme -> Future of (candidates, decoded icons)
+
+    def _prepare(self, theme):
+        words = self.word_bank[theme]
+        lengths = [len(words[category]) for category in self.categories]
+        candidates = [
+            tuple(random.randrange(length) for length in lengths)
+            for _ in range(self.num_candidates)
+        ]
+        decoded = None
+        if not self.icon_cache.loaded(theme):
+            decoded = self.icon_cache.decode(theme)
+        return candidates, decoded
+
+    def prepare(self, theme):
+        if theme in self._jobs:
+            self._jobs.move_to_end(theme)
+            return
+        self._jobs[theme] = self._executor.submit(self._prepare, theme)
+        while len(self._jobs) > self.max_jobs:
+            _, future = self._jobs.popitem(last=False)
+            if not future.cancel():
+                future.add_done_callback(_close_unused)
+
+    def take(self, theme):
+        """
+        Hand over the board prepared for a theme.
+
+        The decoded icons are converted and cached in `icon_cache`, so picking the icons
+        afterwards needs no disk I/O. A job that is still running is waited for, since
+        that is quicker than starting over on the main thread.
+
+        Returns:
+            list: The phrase candidates as tuples of word indexes, in category order,
+            or an empty list when nothing was prepared for the theme or preparing failed.
+        """
+        future = self._jobs.pop(theme, None)
+        if future is None:
+            return []
+        if future.done():
+            self.hits += 1
+        else:
+            self.waits += 1
+        try:
+            candidates, decoded = future.result()
+        except (KeyError, ValueError, struct.error, OSError, pygame.error):
+            return []  # Generated on the main thread instead, which reports the error
+        if decoded is not None:
+            self.icon_cache.adopt(theme, *decoded)  # Closes a pack it does not need
+        return candidates
+
+    def discard(self, theme=None):
+        """
+        Drop the prepared board of a theme, or of every theme, e.g. after its files changed.
+        """
+        themes = list(self._jobs) if theme is None else [theme]
+        for name in themes:
+            future = self._jobs.pop(name, None)
+            if future is not None and not future.cancel():
+                future.add_done_callback(_close_unused)
+
+    def close(self):
+        self.discard()
+        self._executor.shutdown(wait=False, cancel_futures=True)
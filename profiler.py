@@ -0,0 +1,234 @@
+"""
+Optional frame and event profiling for the storymaker main loop.
+
+Start the app with `python storymaker.py --profile` to record, for every frame, how
+long event handling, `draw_ui`, text rendering and presenting the frame took, how many
+events of each type arrived, and how long icon folders and word lists took to load,
+including the icons the prefetch threads decode, which show up on their own trace rows.
+F3 toggles an overlay with the frame rate and the p50/p99 frame times. On exit the
+recorded spans are written in Chrome's trace-event format, open them in
+chrome://tracing or https://ui.perfetto.dev.
+
+Profiling works by wrapping methods of one `StoryMaker` instance when it is attached,
+so an app without a profiler runs the unwrapped methods and pays nothing for it.
+"""
+
+import os
+import json
+import time
+import threading
+from collections import deque, Counter
+
+import pygame
+
+from wordbank import open_word_bank
+
+OVERLAY_KEY = pygame.K_F3
+OVERLAY_RECT = pygame.Rect(8, 8, 230, 92)
+DEFAULT_TRACE_PATH = "storymaker_trace.json"
+
+
+def percentile(values, fraction):
+    """
+    Return the value below which `fraction` of the sorted `values` lie.
+    """
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+# FrameProfiler class
+class FrameProfiler:
+    """
+    Records per-frame phase timings, event counts and load times of a `StoryMaker`.
+
+    Args:
+        frames (int, optional): The number of recent frames kept in the ring buffer the
+        overlay statistics are computed from. Defaults to 600.
+        max_spans (int, optional): The number of trace spans kept for the trace file;
+        the oldest are dropped first. Defaults to 200000.
+
+    Attributes:
+        frames (collections.deque): (start, duration, phases) of the recent frames, with
+        times in seconds and `phases` mapping a phase name to its duration.
+        event_counts (collections.Counter): The number of events seen per event type.
+        show_overlay (bool): Whether the overlay is drawn.
+
+    Methods:
+        attach(app): Wrap the methods of a StoryMaker so they are timed.
+        begin_frame(events): Start timing a frame and count its events.
+        end_frame(): Finish the frame.
+        stats(): Return the frame rate and frame time percentiles.
+        write_trace(path): Write the recorded spans in Chrome trace-event format.
+
+    Example:
+        app = StoryMaker()
+        app.profiler = FrameProfiler().attach(app)
+        app.run()
+        app.profiler.write_trace("storymaker_trace.json")
+    """
+
+    def __init__(self, frames=600, max_spans=200000):
+        self.frames = deque(maxlen=frames)
+        self.event_counts = Counter()
+        self.show_overlay = False
+        # (name, category, start, duration, thread id)
+        self._spans = deque(maxlen=max_spans)
+        self._origin = time.perf_counter()
+        self._frame_start = None
+        self._phases = None
+        self._app = None
+        self._font = None
+
+    def attach(self, app):
+        """
+        Wrap the timed methods of `app` and return the profiler.
+
+        The word bank is opened right away, compiling the JSON files when they changed,
+        so that its load is timed too.
+        """
+        self._app = app
+        app.handle_dragging = self._timed("events", app.handle_dragging)
+        app.draw_ui = self._draw_ui(self._timed("draw_ui", app.draw_ui))
+        app.render_dirty = self._render_dirty(self._timed("present", app.render_dirty))
+        app.text_cache.render = self._timed("text", app.text_cache.render)
+
+        icon_cache = app.icon_cache
+        icon_cache._load = self._timed("icon_load", icon_cache._load, "load")
+        icon_cache.decode = self._timed("icon_decode", icon_cache.decode, "load")
+        icon_cache.adopt = self._timed("icon_adopt", icon_cache.adopt, "load")
+
+        if "word_bank" not in vars(app):  # Not opened yet, see StoryMaker.word_bank
+            word_bank = self._timed("json_load", open_word_bank, "load")()
+            vars(app)["word_bank"] = word_bank
+        app.word_bank.update = self._timed("json_load", app.word_bank.update, "load")
+        return self
+
+    def _timed(self, name, function, category="frame"):
+        spans = self._spans
+        main_thread = threading.main_thread()
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                duration = time.perf_counter() - start
+                thread = threading.current_thread()
+                spans.append((name, category, start, duration, thread.ident))
+                # Work on other threads, e.g. prefetching, does not slow down the frame
+                if thread is main_thread and self._phases is not None:
+                    self._phases[name] = self._phases.get(name, 0.0) + duration
+
+        return timed
+
+    def _draw_ui(self, draw_ui):
+        def draw_ui_with_overlay():
+            draw_ui()
+            if self.show_overlay:
+                self.draw_overlay(self._app.screen)
+
+        return draw_ui_with_overlay
+
+    def _render_dirty(self, render_dirty):
+        def render_dirty_with_overlay():
+            app = self._app
+            if self.show_overlay and (app.full_redraw or app.dirty_rects):
+                app.mark_dirty(OVERLAY_RECT)  # Refresh the numbers with every frame
+            render_dirty()
+
+        return render_dirty_with_overlay
+
+    def begin_frame(self, events):
+        self._frame_start = time.perf_counter()
+        self._phases = {}
+        for event in events:
+            self.event_counts[pygame.event.event_name(event.type)] += 1
+            if event.type == pygame.KEYDOWN and event.key == OVERLAY_KEY:
+                self.show_overlay = not self.show_overlay
+                self._app.mark_dirty(OVERLAY_RECT)
+
+    def end_frame(self):
+        if self._frame_start is None:
+            return
+        duration = time.perf_counter() - self._frame_start
+        # Present includes the draw_ui call it makes, report only its own share
+        phases = self._phases
+        if "present" in phases:
+            phases["present"] -= phases.get("draw_ui", 0.0)
+        if "draw_ui" in phases:
+            phases["draw_ui"] -= phases.get("text", 0.0)
+        self.frames.append((self._frame_start, duration, phases))
+        thread = threading.main_thread().ident
+        self._spans.append(("frame", "frame", self._frame_start, duration, thread))
+        self._frame_start = self._phases = None
+
+    def stats(self):
+        """
+        Return the frame rate over the last second and frame time percentiles in ms.
+        """
+        if not self.frames:
+            return {"fps": 0.0, "p50_ms": 0.0, "p99_ms": 0.0, "frames": 0}
+        durations = sorted(duration for _, duration, _ in self.frames)
+        now = time.perf_counter()
+        recent = sum(1 for start, _, _ in self.frames if now - start <= 1.0)
+        return {
+            "fps": float(recent),
+            "p50_ms": percentile(durations, 0.50) * 1000,
+            "p99_ms": percentile(durations, 0.99) * 1000,
+            "frames": len(self.frames),
+        }
+
+    def draw_overlay(self, screen):
+        stats = self.stats()
+        pygame.draw.rect(screen, (0, 0, 0), OVERLAY_RECT)
+        if self._font is None:
+            self._font = pygame.font.Font(None, 26)  # pygame's default font
+        font = self._font
+        lines = [
+            f"FPS {stats['fps']:.0f}",
+            f"p50 {stats['p50_ms']:.2f} ms",
+            f"p99 {stats['p99_ms']:.2f} ms",
+        ]
+        y = OVERLAY_RECT.y + 6
+        for line in lines:
+            # The numbers change every frame, so they bypass the text cache
+            surface = font.render(line, True, (255, 255, 255))
+            screen.blit(surface, (OVERLAY_RECT.x + 8, y))
+            y += font.get_linesize()
+
+    def write_trace(self, path=DEFAULT_TRACE_PATH):
+        """
+        Write the recorded spans and event counts as a Chrome trace-event JSON file.
+
+        Returns:
+            str: The path of the trace file.
+        """
+        pid = os.getpid()
+        # The main thread is row 1, other threads follow in order of appearance
+        tids = {threading.main_thread().ident: 1}
+        trace_events = [
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": duration * 1e6,
+                "pid": pid,
+                "tid": tids.setdefault(thread, len(tids) + 1),
+            }
+            for name, category, start, duration, thread in self._spans
+        ]
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(
+                {
+                    "traceEvents": trace_events,
+                    "displayTimeUnit": "ms",
+                    "otherData": {
+                        "event_counts": dict(self.event_counts),
+                        "frame_stats": self.stats(),
+                    },
+                },
+                file,
+            )
+        return path
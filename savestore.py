@@ -0,0 +1,311 @@
+"""
+Append-only store of saved story boards, so saves can be browsed and reopened in the app.
+
+Every save is one record appended to a log, and the log position of every record is
+appended to a small index file. Saving is a single buffered append, and reading any
+saved board back is a seek into the log, however many boards the store holds.
+
+Log record (little-endian):
+    header      payload length, CRC-32 of the payload, save time (uint32, uint32, float64)
+    payload     theme, then for every phrase its text, position and word indexes,
+                then every icon path; strings are a uint16 length and UTF-8 bytes
+
+The index is a header followed by one uint64 log position per record. It can always be
+rebuilt from the log: index entries naming records that are missing or damaged in the
+log are dropped, the missing entries are recovered by scanning the records after the
+last intact indexed one, and a partly written record at the end of the log (e.g. after
+a crash) is cut off. `flush` writes the log before the index, so the index only falls
+behind the log.
+
+HTML stays available as a derived view of the store:
+
+    python savestore.py list --last 20
+    python savestore.py export --out saves/export
+"""
+
+import os
+import sys
+import time
+import zlib
+import struct
+import argparse
+from array import array
+
+MAGIC = b"SIDX"
+VERSION = 1
+INDEX_HEADER = struct.Struct("<4sI")  # magic, version
+RECORD = struct.Struct("<IId")  # payload length, crc32, save time
+_COUNT = struct.Struct("<B")
+_LENGTH = struct.Struct("<H")
+_POSITION = struct.Struct("<hh")
+
+DEFAULT_LOG_PATH = os.path.join("saves", "boards.log")
+DEFAULT_INDEX_PATH = os.path.join("saves", "boards.idx")
+
+
+def _pack_string(parts, text):
+    data = text.encode("utf-8")
+    parts.append(_LENGTH.pack(len(data)))
+    parts.append(data)
+
+
+def encode_board(board):
+    """
+    Return the payload bytes of a board.
+
+    Args:
+        board (dict): A board with "theme", "phrases" and "icons" keys, and optionally
+        "positions" (one (x, y) per phrase) and "words" (one tuple of word indexes per
+        phrase).
+    """
+    parts = []
+    _pack_string(parts, board["theme"])
+    phrases = board["phrases"]
+    positions = board.get("positions") or [(0, 0)] * len(phrases)
+    words = board.get("words") or [()] * len(phrases)
+    parts.append(_COUNT.pack(len(phrases)))
+    for phrase, position, indices in zip(phrases, positions, words):
+        _pack_string(parts, phrase)
+        parts.append(_POSITION.pack(*position))
+        parts.append(_COUNT.pack(len(indices)))
+        parts.append(struct.pack(f"<{len(indices)}H", *indices))
+    parts.append(_COUNT.pack(len(board["icons"])))
+    for path in board["icons"]:
+        _pack_string(parts, path)
+    return b"".join(parts)
+
+
+def decode_board(payload):
+    """
+    Return the board dict of a payload written by `encode_board`.
+    """
+    offset = 0
+
+    def unpack(fmt):
+        nonlocal offset
+        values = fmt.unpack_from(payload, offset)
+        offset += fmt.size
+        return values
+
+    def string():
+        nonlocal offset
+        (length,) = unpack(_LENGTH)
+        offset += length
+        return payload[offset - length : offset].decode("utf-8")
+
+    theme = string()
+    phrases, positions, words = [], [], []
+    for _ in range(unpack(_COUNT)[0]):
+        phrases.append(string())
+        positions.append(unpack(_POSITION))
+        count = unpack(_COUNT)[0]
+        words.append(struct.unpack_from(f"<{count}H", payload, offset))
+        offset += 2 * count
+    icons = [string() for _ in range(unpack(_COUNT)[0])]
+    return {
+        "theme": theme,
+        "phrases": phrases,
+        "positions": positions,
+        "words": words,
+        "icons": icons,
+    }
+
+
+# SaveStore class
+class SaveStore:
+    """
+    An append-only log of saved boards with an offset index for random access.
+
+    Args:
+        log_path (str, optional): The record log. Defaults to "saves/boards.log".
+        index_path (str, optional): The offset index. Defaults to "saves/boards.idx".
+
+    Methods:
+        append(board): Save a board and return its record number.
+        flush(): Push appended records to disk.
+        close(): Flush and release the files.
+
+    `store[i]` returns the i-th saved board as a dict with "theme", "phrases",
+    "positions", "words", "icons" and "saved" (a Unix timestamp) keys, negative numbers
+    count from the most recent save. Boards have the "theme", "phrases" and "icons" keys
+    `siteexport.SiteExporter.add` expects.
+
+    Example:
+        store = SaveStore()
+        number = store.append({"theme": "Medieval", "phrases": phrases, "icons": icons})
+        print(len(store), store[-1]["phrases"])
+        store.close()
+    """
+
+    def __init__(self, log_path=DEFAULT_LOG_PATH, index_path=DEFAULT_INDEX_PATH):
+        self.log_path = log_path
+        self.index_path = index_path
+        self.offsets = array("Q")
+        if os.path.exists(index_path):
+            with open(index_path, "rb") as file:
+                header = file.read(INDEX_HEADER.size)
+                if header and INDEX_HEADER.unpack(header) != (MAGIC, VERSION):
+                    raise ValueError(f"{index_path} is not a version {VERSION} index")
+                data = file.read()
+            self.offsets.frombytes(data[: len(data) // 8 * 8])
+            if sys.byteorder == "big":
+                self.offsets.byteswap()
+
+        self._log = open(log_path, "a+b", buffering=1 << 16)
+        self._index = open(index_path, "a+b")
+        if self._index.tell() == 0:
+            self._index.write(INDEX_HEADER.pack(MAGIC, VERSION))
+        self._recover()
+        self._dirty = False
+
+    def _read_record(self, position):
+        # Return the end of the complete, intact record at `position`, or None
+        self._log.seek(position)
+        header = self._log.read(RECORD.size)
+        if len(header) < RECORD.size:
+            return None
+        length, checksum, _ = RECORD.unpack(header)
+        payload = self._log.read(length)
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return None
+        return position + RECORD.size + length
+
+    def _recover(self):
+        # Drop index entries naming records that never fully reached the log, e.g. when
+        # the process died between writing the index and the log
+        position = 0
+        while self.offsets:
+            end = self._read_record(self.offsets[-1])
+            if end is not None:
+                position = end
+                break
+            self.offsets.pop()
+        index_size = INDEX_HEADER.size + 8 * len(self.offsets)
+        if self._index.seek(0, os.SEEK_END) != index_size:
+            self._index.truncate(index_size)
+            self._index.seek(index_size)
+
+        # Index the records after the last indexed one, and cut off a torn last record
+        log_size = self._log.seek(0, os.SEEK_END)
+        missing = array("Q")
+        while position < log_size:
+            end = self._read_record(position)
+            if end is None:
+                break
+            missing.append(position)
+            position = end
+        if position < log_size:
+            self._log.truncate(position)
+        self._log.seek(0, os.SEEK_END)
+        if missing:
+            self._write_offsets(missing)
+            self.offsets.extend(missing)
+        self._index.flush()
+        self._indexed = len(self.offsets)  # Offsets in the index file
+
+    def _write_offsets(self, offsets):
+        if sys.byteorder == "big":
+            offsets = array("Q", offsets)
+            offsets.byteswap()
+        self._index.write(offsets.tobytes())
+
+    def append(self, board, saved=None):
+        """
+        Append a board to the log and return its record number.
+
+        Args:
+            board (dict): The board, see `encode_board`.
+            saved (float, optional): The save time. Defaults to now.
+        """
+        payload = encode_board(board)
+        position = self._log.tell()
+        self._log.write(
+            RECORD.pack(len(payload), zlib.crc32(payload), saved or time.time())
+        )
+        self._log.write(payload)
+        self.offsets.append(position)  # Indexed by `flush`, after the log is on disk
+        self._dirty = True
+        return len(self.offsets) - 1
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, number):
+        position = self.offsets[number]  # Raises IndexError like a list
+        if self._dirty:
+            self.flush()
+        self._log.seek(position)
+        length, checksum, saved = RECORD.unpack(self._log.read(RECORD.size))
+        payload = self._log.read(length)
+        self._log.seek(0, os.SEEK_END)
+        if zlib.crc32(payload) != checksum:
+            raise ValueError(f"record {number} of {self.log_path} is damaged")
+        board = decode_board(payload)
+        board["saved"] = saved
+        return board
+
+    def __iter__(self):
+        for number in range(len(self.offsets)):
+            yield self[number]
+
+    def flush(self):
+        # The log goes first, so the index never names a record that is not on disk
+        self._log.flush()
+        if self._indexed < len(self.offsets):
+            self._write_offsets(self.offsets[self._indexed :])
+            self._indexed = len(self.offsets)
+        self._index.flush()
+        self._dirty = False
+
+    def close(self):
+        self.flush()
+        self._log.close()
+        self._index.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Browse and export saved boards.")
+    parser.add_argument("--log", default=DEFAULT_LOG_PATH, help="record log")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="offset index")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="print saved boards")
+    list_parser.add_argument("--last", type=int, default=20, help="number of boards")
+    export_parser = commands.add_parser("export", help="write saved boards as HTML")
+    export_parser.add_argument("--out", default="saves/export", help="output folder")
+    export_parser.add_argument("--per-page", type=int, default=50, help="boards per page")
+    export_parser.add_argument(
+        "--assets",
+        choices=["files", "sprites", "inline"],
+        default="files",
+        help="link icon files, pack them into sprite sheets, or inline them",
+    )
+    args = parser.parse_args(argv)
+
+    store = SaveStore(args.log, args.index)
+    try:
+        if args.command == "list":
+            for number in range(max(0, len(store) - args.last), len(store)):
+                board = store[number]
+                saved = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(board["saved"]))
+                print(f"{number:6d}  {saved}  {board['theme']}")
+                for phrase in board["phrases"]:
+                    print(f"        {phrase}")
+        else:
+            from assetpack import make_assets
+            from siteexport import SiteExporter
+
+            exporter = SiteExporter(
+                args.out,
+                args.per_page,
+                prefix="saves",
+                assets=make_assets(args.assets, args.out),
+            )
+            for board in store:
+                exporter.add(board)
+            print(f"wrote {exporter.boards} boards to {exporter.close()}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,391 @@
+"""
+Static HTML export of story boards, used by the Save button and for bulk exports.
+
+Bulk export reads story seeds as JSON Lines (as written by storyseeds.py) or generates
+them on the fly, and writes them as numbered pages plus an index page:
+
+    python storyseeds.py --count 50000 --seed 7 | python siteexport.py --out saves/export
+    python siteexport.py --count 50000 --seed 7 --per-page 100
+
+Pages are built from templates split once at import time and handed to a background
+writer thread, so neither the window nor the generator waits on the disk. Only the
+current page is held in memory, so memory use stays flat however many boards are
+exported.
+"""
+
+import os
+import sys
+import json
+import html
+import queue
+import argparse
+import subprocess  # so we can choose chrome
+import threading
+import webbrowser
+
+# Labels for the five phrases, in board order; the app draws the same ones
+arrow = "»"  # Unicode string for the arrow character
+BOX_LABELS = [
+    f"Plot Hook {arrow}",
+    f"Barrier {arrow}",
+    f"Challenge {arrow}",
+    f"Showdown {arrow}",
+    f"Reward {arrow}",
+]
+
+PAGE_TEMPLATE = """
+<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{title}</title>
+    <link rel="stylesheet" type="text/css" href="{stylesheet}">{head}
+</head>
+
+<body>
+{content}
+</body>
+</html>
+"""
+
+BOARD_TEMPLATE = """    <div class="container">
+    {content}
+    </div>"""
+
+
+def _split_template(template, *fields):
+    # Split a template on its {fields} once, so filling it in is a single join
+    parts = []
+    for field in fields:
+        before, template = template.split("{" + field + "}", 1)
+        parts.append(before)
+    parts.append(template)
+    return parts
+
+
+_PAGE_PARTS = _split_template(PAGE_TEMPLATE, "title", "stylesheet", "head", "content")
+_BOARD_PARTS = _split_template(BOARD_TEMPLATE, "content")
+
+
+def fill_page(title, content, stylesheet="styles.css", head=""):
+    """
+    Fill in the page template with an already escaped title and HTML content.
+
+    `head` is extra HTML for the page head, e.g. the sprite sheet stylesheet links of
+    `assetpack.SpriteSheets.head_html`.
+    """
+    start, after_title, after_stylesheet, after_head, tail = _PAGE_PARTS
+    if head:
+        head = "\n    " + head
+    return "".join(
+        (
+            start,
+            title,
+            after_title,
+            stylesheet,
+            after_stylesheet,
+            head,
+            after_head,
+            content,
+            tail,
+        )
+    )
+
+
+def url_path(path, start):
+    """
+    Return `path` relative to the folder `start`, with forward slashes for use in a URL.
+    """
+    return os.path.relpath(path, start).replace(os.sep, "/")
+
+
+def render_board(phrases, icon_paths, page_dir="saves", labels=BOX_LABELS, assets=None):
+    """
+    Render the HTML of one story board: its icon row followed by the labelled phrases.
+
+    Args:
+        phrases (list): The phrase strings, in board order.
+        icon_paths (list): The paths of the icons, e.g. "icons/Medieval/icon_00000001.png".
+        page_dir (str, optional): The folder the page is written to, icon links are made
+        relative to it. Defaults to "saves".
+        labels (list, optional): The labels put in front of the phrases.
+        assets (optional): How icons are included, an `assetpack.SpriteSheets` or
+        `assetpack.InlineIcons`. By default every icon links its own file.
+
+    Returns:
+        str: The board's HTML.
+
+    Example:
+        >>> render_board(["Ancient Keep Guard"], ["icons/Medieval/icon_00000001.png"])
+    """
+    parts = ["<div class='container1'>\n"]
+    for path in icon_paths:
+        if assets is None:
+            parts.append(f"<img src='{url_path(path, page_dir)}' alt='icon'>\n")
+        else:
+            parts.append(assets.icon_html(path, page_dir) + "\n")
+    parts.append("</div><div class='container2'>\n")
+    for phrase, label in zip(phrases, labels):
+        parts.append(f"<h3>{label} {html.escape(phrase)}</h3>\n")
+    parts.append("</div>")
+    return _BOARD_PARTS[0] + "".join(parts) + _BOARD_PARTS[1]
+
+
+# BackgroundWriter class
+class BackgroundWriter:
+    """
+    A thread that writes files handed to it, so callers never block on the disk.
+
+    Args:
+        max_pending (int, optional): The number of files that may wait to be written
+        before `write` blocks, which keeps memory use bounded. Defaults to 64.
+
+    Attributes:
+        errors (list): (path, exception) pairs of the jobs that failed, oldest first.
+
+    Methods:
+        write(path, text, then=None): Queue a file to be written.
+        close(): Write everything still queued and stop the thread.
+
+    A job that fails, whether writing the file or in `then`, is printed to stderr and
+    recorded in `errors`; the thread goes on with the next job.
+
+    Example:
+        writer = BackgroundWriter()
+        writer.write("saves/board.html", page, then=open_in_browser)
+        writer.close()
+    """
+
+    def __init__(self, max_pending=64):
+        self._queue = queue.Queue(max_pending)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self.errors = []
+
+    def write(self, path, text, then=None):
+        """
+        Queue `text` to be written to `path`; `then(path)` is called once it is on disk.
+
+        `text` may also be a function returning the text, which is then called on the
+        writer thread, e.g. to render a page whose sprite sheets still need packing.
+        """
+        self._queue.put((path, text, then))
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            path, text, then = job
+            try:
+                if callable(text):
+                    text = text()
+                with open(path, "w", encoding="utf-8", buffering=1 << 16) as file:
+                    file.write(text)
+                if then is not None:
+                    then(path)
+            except Exception as error:  # One bad job must not stop the writer
+                self.errors.append((path, error))
+                print(f"background write of {path} failed: {error!r}", file=sys.stderr)
+
+
+# Chrome is preferred when it is installed in its default Windows location
+CHROME_PATH = r"C:\Program Files\Google\Chrome\Application\chrome.exe"
+
+
+def open_in_browser(path):
+    """
+    Open a written HTML file in Chrome, or in the default web browser without Chrome.
+    """
+    url = "file://" + os.path.abspath(path)
+    if os.path.exists(CHROME_PATH):
+        subprocess.Popen([CHROME_PATH, url])
+    else:
+        webbrowser.open(url)
+
+
+# SiteExporter class
+class SiteExporter:
+    """
+    Writes a stream of story boards as numbered HTML pages plus an index page.
+
+    Args:
+        out_dir (str, optional): The folder the pages are written to. Defaults to "saves".
+        per_page (int, optional): The number of boards on each page. Defaults to 50.
+        prefix (str, optional): The file name prefix of the pages. Defaults to "stories".
+        writer (BackgroundWriter, optional): The writer to use, a private one is started
+        when omitted.
+        assets (optional): How icons are included, see `render_board`.
+
+    Methods:
+        add(board): Add a board, a dict with "theme", "phrases" and "icons" keys.
+        close(): Write the last page and the index page and return the index path.
+
+    Example:
+        exporter = SiteExporter("saves/export", per_page=100)
+        for board in boards:
+            exporter.add(board)
+        index_path = exporter.close()
+    """
+
+    def __init__(
+        self, out_dir="saves", per_page=50, prefix="stories", writer=None, assets=None
+    ):
+        os.makedirs(out_dir, exist_ok=True)
+        self.out_dir = out_dir
+        self.per_page = per_page
+        self.prefix = prefix
+        self.stylesheet = url_path(os.path.join("saves", "styles.css"), out_dir)
+        self._own_writer = writer is None
+        self.writer = writer or BackgroundWriter()
+        self.assets = assets
+        self.boards = 0
+        self._page = []
+        self._page_icons = {}  # Icon folder -> one of its icons, for sprite links
+        self._pages = []  # (file name, theme of its first board) of every page
+        self._pending = None  # (number, boards HTML, head) of the page not yet written
+
+    def add(self, board):
+        if not self._page:
+            self._page_theme = board["theme"]
+        self._page.append(
+            render_board(
+                board["phrases"], board["icons"], self.out_dir, assets=self.assets
+            )
+        )
+        if self.assets is not None:
+            for path in board["icons"]:
+                self._page_icons.setdefault(os.path.dirname(path), path)
+        self.boards += 1
+        if len(self._page) >= self.per_page:
+            self._flush_page()
+
+    def _page_name(self, number):
+        return f"{self.prefix}_{number:05d}.html"
+
+    def _flush_page(self):
+        # Pages are written one page late, so a page knows whether a next one exists
+        if not self._page:
+            return
+        if self._pending is not None:
+            self._write_page(*self._pending, has_next=True)
+        number = len(self._pages) + 1
+        self._pages.append((self._page_name(number), self._page_theme))
+        head = ""
+        if self.assets is not None:
+            head = self.assets.head_html(list(self._page_icons.values()), self.out_dir)
+        self._pending = (number, "\n".join(self._page), head)
+        self._page = []
+        self._page_icons = {}
+
+    def _write_page(self, number, boards, head, has_next):
+        links = [f"<a href='{self.prefix}_index.html'>Index</a>"]
+        if number > 1:
+            links.append(f"<a href='{self._page_name(number - 1)}'>Previous</a>")
+        if has_next:
+            links.append(f"<a href='{self._page_name(number + 1)}'>Next</a>")
+        nav = "<p>" + " ".join(links) + "</p>"
+        self.writer.write(
+            os.path.join(self.out_dir, self._page_name(number)),
+            fill_page(
+                f"Story Maker page {number}", nav + boards + nav, self.stylesheet, head
+            ),
+        )
+
+    def close(self):
+        self._flush_page()
+        if self._pending is not None:
+            self._write_page(*self._pending, has_next=False)
+            self._pending = None
+        items = [
+            f"<li><a href='{name}'>Page {number}</a> ({html.escape(theme)} ...)</li>\n"
+            for number, (name, theme) in enumerate(self._pages, 1)
+        ]
+        content = (
+            f"<div class='container'><h3>{self.boards} stories</h3>\n<ul>\n"
+            + "".join(items)
+            + "</ul></div>"
+        )
+        index_path = os.path.join(self.out_dir, f"{self.prefix}_index.html")
+        self.writer.write(
+            index_path, fill_page("Story Maker", content, self.stylesheet)
+        )
+        if self._own_writer:
+            self.writer.close()
+        return index_path
+
+
+def read_boards(file):
+    """
+    Yield the boards of a JSON Lines stream, skipping blank lines.
+    """
+    for line in file:
+        if line.strip():
+            yield json.loads(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Export story seeds to paginated HTML pages with an index page."
+    )
+    parser.add_argument(
+        "input", nargs="?", help="JSON Lines seed file (default: stdin)"
+    )
+    parser.add_argument("--count", type=int, help="generate this many seeds instead")
+    parser.add_argument("--seed", type=int, default=0, help="seed used with --count")
+    parser.add_argument("--themes", nargs="*", help="themes used with --count")
+    parser.add_argument("--out", default="saves", help="output folder")
+    parser.add_argument("--per-page", type=int, default=50, help="boards per page")
+    parser.add_argument("--prefix", default="stories", help="page file name prefix")
+    parser.add_argument(
+        "--assets",
+        choices=["files", "sprites", "inline"],
+        default="files",
+        help="link icon files, pack them into sprite sheets, or inline them",
+    )
+    parser.add_argument(
+        "--open", action="store_true", help="open the index page in a browser"
+    )
+    args = parser.parse_args(argv)
+
+    if args.count is not None:
+        from storyseeds import generate_batch, resolve_themes
+        from wordbank import open_word_bank
+
+        word_bank = open_word_bank()
+        try:
+            themes = resolve_themes(word_bank, args.themes)
+        except ValueError as error:
+            parser.error(str(error))
+        word_bank.close()
+        blocks = generate_batch(args.count, args.seed, themes)
+        boards = (json.loads(line) for block in blocks for line in block.splitlines())
+        input_file = None
+    else:
+        input_file = open(args.input, encoding="utf-8") if args.input else sys.stdin
+        boards = read_boards(input_file)
+
+    from assetpack import make_assets
+
+    exporter = SiteExporter(
+        args.out, args.per_page, args.prefix, assets=make_assets(args.assets, args.out)
+    )
+    try:
+        for board in boards:
+            exporter.add(board)
+    finally:
+        index_path = exporter.close()
+        if input_file not in (None, sys.stdin):
+            input_file.close()
+    print(f"wrote {exporter.boards} stories to {index_path}")
+    if args.open:
+        open_in_browser(index_path)
+
+
+if __name__ == "__main__":
+    main()
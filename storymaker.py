@@ -1,480 +1,1236 @@
-import json
-import random
-import datetime
-import os
-import glob
-import subprocess  # so we can choose chrome
-import pygame
-
-# Initialize Pygame
-pygame.init()
-
-# Screen size
-screen_width, screen_height = 768, 1024
-screen = pygame.display.set_mode((screen_width, screen_height))
-
-# Colors
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
-
-# Fonts
-gothic_font = pygame.font.Font("fonts/CaslonAntique.ttf", 26)
-title_font = pygame.font.Font("fonts/Almendra-Regular.ttf", 36)
-
-
-# Load data sets
-def load_data(file_name):
-    with open(f"data/{file_name}") as file:
-        return json.load(file)
-
-
-# Load background image
-background_image = pygame.image.load("bg/bg.png")
-
-# Theme and category selection defaults
-current_theme="Introduce"
-data = load_data("introduce.json")  # Initial data load
-current_categories = ["DescriptiveWords", "Nouns", "Actions"]
-
-
-# Function to generate random phrases with a default theme of "Introduce"
-def generate_phrases():
-    """
-    Generate random phrases based on a specified theme.
-
-    Args:
-        current_theme (str, optional): The theme for generating phrases. Defaults to "Introduce."
-
-    Returns:
-        list: A list of generated phrases, each represented as a tuple containing the phrase text
-        and its initial position on the screen.
-
-    The function generates random phrases by selecting words from categories associated with the
-    specified theme. It constructs phrases by randomly selecting words from each category and
-    joining them together. The resulting phrases are stored as tuples with their initial screen
-    positions.
-
-    Example:
-        To generate phrases with the default theme:
-        >>> phrases = generate_phrases()
-
-        To generate phrases with a specific theme:
-        >>> phrases = generate_phrases("Medieval")
-    """
-    phrases = []
-    theme_key = current_theme.capitalize()
-    for _ in range(5):
-        phrase = " ".join(
-            random.choice(data[theme_key][category]) for category in current_categories
-        )
-        phrases.append(
-            (phrase, (screen_width - 500, _ * 100 + 215))
-        )  # Store phrase with its initial position
-    return phrases
-
-
-# Updated generate_icons function with a default theme of "Medieval"
-def generate_icons(num_icons=5):
-    """
-    Generate a random selection of icons associated with a specified theme.
-
-    Args:
-        theme (str, optional): The theme for which icons should be generated. Defaults 
-        to "Medieval." 
-        num_icons (int, optional): The number of icons to generate. Defaults to 5.
-
-    Returns:
-        list: A list of tuples, each containing a loaded image object and the file path 
-        of the corresponding icon.
-
-    The function generates a random selection of icons based on the specified theme. It
-    constructs the file path to search for icons in the theme's directory. If the theme
-    directory does not exist,    it falls back to the "Medieval" theme. It then selects
-    a random subset of available icons and loads  them as image objects.
-
-    Example:
-        To generate a list of 5 icons with the default "Medieval" theme:
-        >>> icons = generate_icons()
-
-        To generate a list of icons with a specific theme and a custom number of icons:
-        >>> icons = generate_icons("Fantasy", num_icons=10)
-    """
-    global current_theme
-    icon_path = f"icons/{current_theme}/*.png"
-
-    if not os.path.exists(f"icons/{current_theme}"):
-        icon_path = "icons/Medieval/*.png"
-
-    icon_files = glob.glob(icon_path)
-    num_icons = min(num_icons, len(icon_files))
-    if num_icons > 0:
-        icon_files = random.sample(icon_files, num_icons)
-
-    icons_with_paths = [
-        (pygame.image.load(icon_file), icon_file) for icon_file in icon_files
-    ]
-    return icons_with_paths
-
-
-# You can now call generate_phrases() and generate_icons() without passing current_theme.
-random_icons = generate_icons()
-
-# Labels for the boxes
-arrow = "\u00BB"  # Unicode string for the arrow character
-box_labels = [
-    f"Plot Hook {arrow}",
-    f"Barrier {arrow}",
-    f"Challenge {arrow}",
-    f"Showdown {arrow}",
-    f"Reward {arrow}",
-]
-
-# Drag and drop variables
-dragging = False
-dragged_phrase_index = None
-phrases = generate_phrases()
-
-# Button and dropdown variables
-save_button = pygame.Rect(50, 700, 100, 30)
-generate_button = pygame.Rect(160, 700, 100, 30)
-
-# Dropdown options with capitalized names
-dropdown_options = [
-    f.replace(".json", "") for f in os.listdir("data") if f.endswith(".json")
-]
-
-
-# DataSetButton class
-class DataSetButton:
-    """
-    A class representing a button used for selecting data sets.
-
-    Args:
-        x (int): The x-coordinate of the button's top-left corner.
-        y (int): The y-coordinate of the button's top-left corner.
-        width (int): The width of the button.
-        height (int): The height of the button.
-        text (str): The text displayed on the button.
-
-    Attributes:
-        rect (pygame.Rect): A rectangular area defining the button's position and size.
-        text (str): The text displayed on the button.
-        selected (bool): A flag indicating whether the button is currently selected.
-
-    Methods:
-        draw(screen): Draw the button on the specified Pygame screen.
-        toggle_select(): Toggle the selection state of the button.
-
-    The `DataSetButton` class represents a clickable button with a rectangular shape, text,
-    and a selection state. It is used for selecting data sets. You can create instances of this
-    class and add them to your Pygame user interface.
-
-    Example:
-        # Create a data set button
-        button = DataSetButton(100, 200, 150, 50, "Data Set 1")
-
-        # Draw the button on the Pygame screen
-        button.draw(screen)
-
-        # Toggle the button's selection state
-        button.toggle_select()
-    """
-
-    def __init__(self, x, y, width, height, text):
-        self.rect = pygame.Rect(x, y, width, height)
-        self.text = text
-        self.selected = False
-
-    def draw(self, screen):
-        # Button background and text colors
-        bg_color = BLACK if self.selected else WHITE
-        text_color = WHITE if self.selected else BLACK
-        pygame.draw.rect(screen, bg_color, self.rect)
-        pygame.draw.rect(screen, text_color, self.rect, 1)
-
-        # Render text
-        text_surface = gothic_font.render(self.text, True, text_color)
-
-        # Calculate text position for vertical centering
-        text_x = self.rect.x + (self.rect.width - text_surface.get_width()) // 2
-        text_y = self.rect.y + (self.rect.height - text_surface.get_height()) // 2
-
-        # Draw text
-        screen.blit(text_surface, (text_x, text_y))
-
-    def toggle_select(self):
-        self.selected = not self.selected
-
-
-# Initialize DataSet buttons
-button_width, button_height = 108, 34  # Customize as needed
-button_gap = 10
-data_set_buttons = []
-for i, option in enumerate(dropdown_options):
-    x = (i % 6) * (button_width + button_gap) + 50  # Adjust starting x-position
-    y = (i // 6) * (button_height + button_gap) + 750  # Adjust starting y-position
-    data_set_buttons.append(DataSetButton(x, y, button_width, button_height, option))
-
-
-# Function to draw the UI elements
-def draw_ui():
-    """
-    Draw the user interface elements on the Pygame screen.
-
-    This function is responsible for rendering various UI elements on the Pygame screen, including
-    the background image, title, labels, icons, phrases, buttons, and data set buttons. It creates a
-    visually appealing and interactive user interface for the application.
-
-    Note:
-        Make sure to set up the necessary global variables (e.g., background_image, title_font,
-        box_labels, random_icons, phrases, save_button, generate_button, data_set_buttons) before
-        calling this function.
-
-    Example:
-        # Set up UI elements
-        background_image = pygame.image.load("background.png")
-        title_font = pygame.font.Font(None, 36)
-        box_labels = ["Label 1", "Label 2", "Label 3"]
-        random_icons = [(icon_surface, _) for icon_surface, _ in random_icons]
-        phrases = [("Phrase 1", (100, 200)), ("Phrase 2", (200, 300))]
-        save_button = pygame.Rect(50, 400, 100, 40)
-        generate_button = pygame.Rect(200, 400, 100, 40)
-        data_set_buttons = [DataSetButton(100, 500, 120, 50, "Data Set 1")]
-
-        # Call the draw_ui function to render the UI elements
-        draw_ui()
-    """
-    screen.blit(background_image, (0, 0))
-
-    # Draw title
-    title_surface = title_font.render(
-        "And then these thoughts billowed forth....", True, BLACK
-    )
-    title_x = (screen_width - title_surface.get_width()) // 2
-    title_y = 20  # Adjust as needed for padding
-    screen.blit(title_surface, (title_x, title_y))
-
-    # Draw labels for boxes
-    for i, label in enumerate(box_labels):
-        text_surface = gothic_font.render(label, True, BLACK)
-        screen.blit(text_surface, (50, i * 100 + 215))
-
-    # Calculate positions and draw icons
-    total_icons_width = (
-        sum(icon_surface.get_width() for icon_surface, _ in random_icons)
-        + (len(random_icons) - 1) * 10
-    )
-    start_x = (screen_width - total_icons_width) // 2
-    y_position = (
-        title_y + title_surface.get_height() + 20
-    )  # Adjust as needed for vertical spacing
-
-    for icon_surface, _ in random_icons:
-        screen.blit(icon_surface, (start_x, y_position))
-        start_x += (
-            icon_surface.get_width() + 10
-        )  # Move to the next position with a 10px gap
-
-    # Draw phrases at their current positions
-    for phrase, pos in phrases:
-        text_surface = gothic_font.render(phrase, True, BLACK)
-        screen.blit(text_surface, pos)
-
-    # Draw buttons with text centered
-    for button, button_text in [(save_button, "Save"), (generate_button, "Generate")]:
-        pygame.draw.rect(screen, WHITE, button)
-        pygame.draw.rect(screen, BLACK, button, 1)
-        button_text_surface = gothic_font.render(button_text, True, BLACK)
-        text_x = button.x + (button.width - button_text_surface.get_width()) // 2
-        text_y = button.y + (button.height - button_text_surface.get_height()) // 2
-        screen.blit(button_text_surface, (text_x, text_y))
-
-    # Draw data set buttons
-    for button in data_set_buttons:
-        button.draw(screen)
-
-
-def save_state():
-    """
-    Save the current state of the application as an HTML file and open it in a web browser.
-
-    This function creates an HTML file containing the current state of the application, including
-    selected icons and phrases. The file is saved with a timestamp and can be opened in a web
-    browser for viewing. If the theme-specific icon folder does not exist, it falls back to the
-    "Medieval" theme.
-
-    The HTML content is generated based on the current state of the application, including icons
-    and phrases. The content is embedded in an HTML template that includes a title and
-    background styling.
-
-    Note:
-        Make sure to set up the necessary global variables (e.g., current_theme, random_icons,
-        phrases) before calling this function.
-
-    Example:
-        # Set up necessary global variables
-        current_theme = "Fantasy"
-        random_icons = [(icon_surface, _) for icon_surface, _ in random_icons]
-        phrases = [("Once upon a time...", (100, 200)), ("In a land far, far away...", 
-        (200, 300))]
-
-        # Call the save_state function to save the current state as an HTML file and open it
-        in a browser
-        save_state()
-    """
-    # Check if the theme-specific icon folder exists, if not, use 'Medieval'
-    icon_theme_folder = (
-        current_theme if os.path.exists(f"icons/{current_theme}") else "Medieval"
-    )
-
-    timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
-    file_name = f"{current_theme}_{timestamp}.html"
-    file_path = os.path.join("saves", file_name)
-
-    content = ""
-
-    content += "<div class='container1'>\n"
-    for _, path in random_icons:  # Access the icon's path
-        icon_file_name = os.path.basename(path)
-        content += (
-            f"<img src='../icons/{icon_theme_folder}/{icon_file_name}' alt='icon'>\n"
-        )
-    content += "</div><div class='container2'>\n"
-    
-    phrases_sorted = sorted(
-        phrases, key=lambda x: x[1][1]
-    )  # Sort phrases by their y-position
-    for (phrase, _), label in zip(phrases_sorted, box_labels):
-        content += f"<h3>{label} {phrase}</h3>\n"
-    content += "</div>"
-
-    first_phrase = phrases_sorted[0][0] if phrases_sorted else ""
-    title = current_theme + " " + first_phrase if phrases_sorted else "Story Maker"
-
-    html_template = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{title}</title>
-    <link rel="stylesheet" type="text/css" href="styles.css">
-</head>
-
-<body>
-    <div class="container">
-    {content}
-    </div>
-</body>
-</html>
-"""
-
-    with open(file_path, "w", encoding="utf-8") as file:
-        file.write(html_template.format(title=current_theme, content=content))
-
-    # Open the HTML file in chrome
-    chrome_path = r"C:\Program Files\Google\Chrome\Application\chrome.exe"
-
-    # Get the current directory of the script
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-
-    # Get the absolute path of the HTML file
-    full_path = os.path.join(script_dir, file_path)
-
-    # Open the HTML file in Chrome
-    subprocess.Popen([chrome_path, "file://" + full_path])
-
-
-# Function to handle phrase dragging and button interactions
-def handle_dragging(event):
-    """
-    Handle phrase dragging and button interactions in the application.
-
-    This function is responsible for managing interactions when the user clicks and drags phrases or
-    interacts with buttons on the screen. It detects button clicks, initiates phrase dragging, and
-    handles button actions such as saving, generating, and selecting data sets.
-
-    Args:
-        event (pygame.Event): The Pygame event representing user input.
-
-    Global Variables:
-        dragging (bool): A flag indicating whether a phrase is currently being dragged.
-        dragged_phrase_index (int): The index of the currently dragged phrase in the 'phrases' list.
-        current_theme (str): The currently selected theme for generating phrases and icons.
-        data (dict): The data loaded for the current theme.
-        random_icons (list): The list of randomly selected icons for the current theme.
-
-    Note:
-        Make sure to set up the necessary global variables (e.g., save_button, generate_button,
-        data_set_buttons, phrases, random_icons, current_theme, data) before calling this function.
-
-    Example:
-        # Set up necessary global variables
-        save_button = pygame.Rect(50, 400, 100, 40)
-        generate_button = pygame.Rect(200, 400, 100, 40)
-        data_set_buttons = [DataSetButton(100, 500, 120, 50, "Data Set 1")]
-        phrases = [("Once upon a time...", (100, 200)), ("In a land far, far away...", (200, 300))]
-        random_icons = [(icon_surface, _) for icon_surface, _ in random_icons]
-        current_theme = "Fantasy"
-        data = load_data(current_theme.lower() + ".json")
-
-        # Call the handle_dragging function to manage user interactions
-        pygame.event.get()  # Get Pygame events
-        for event in pygame.event.get():
-            handle_dragging(event)
-    """
-    global dragging, dragged_phrase_index, current_theme, data, random_icons
-    if event.type == pygame.MOUSEBUTTONDOWN:
-        if save_button.collidepoint(event.pos):
-            save_state()
-        elif generate_button.collidepoint(event.pos):
-            phrases[:] = generate_phrases()
-            random_icons = generate_icons()
-        else:
-            for button in data_set_buttons:
-                if button.rect.collidepoint(event.pos):
-                    current_theme = (
-                        button.text.capitalize()
-                    )  # This ensures the first letter is capitalized
-                    data = load_data(
-                        current_theme.lower() + ".json"
-                    )  # Assuming the file names are lowercase
-                    phrases[:] = generate_phrases()
-                    random_icons = generate_icons()
-                    button.toggle_select()
-                    # Deselect all other buttons
-                    for other_button in data_set_buttons:
-                        if other_button != button:
-                            other_button.selected = False
-                    break
-            for i, (_, pos) in enumerate(phrases):
-                if pygame.Rect(pos, gothic_font.size(phrases[i][0])).collidepoint(
-                    event.pos
-                ):
-                    dragging = True
-                    dragged_phrase_index = i
-                    break
-    elif event.type == pygame.MOUSEBUTTONUP:
-        dragging = False
-        dragged_phrase_index = None
-    elif event.type == pygame.MOUSEMOTION and dragging:
-        if dragged_phrase_index is not None:
-            phrases[dragged_phrase_index] = (
-                phrases[dragged_phrase_index][0],
-                event.pos,
-            )
-
-
-# Main loop
-running = True
-while running:
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-        handle_dragging(event)
-
-    draw_ui()
-    pygame.display.flip()
-
-pygame.quit()
+import time
+
+process_start = time.perf_counter()  # Taken first, so --startup-time includes imports
+
+import datetime
+import html
+import os
+import random
+import argparse
+from functools import cached_property
+import pygame
+from textcache import TextCache
+from iconcache import IconCache
+from wordbank import open_word_bank
+from boardid import BoardCodec, from_base32, to_base32
+from storyseeds import ThemeBlend
+from prefetch import BoardPrefetcher
+from hotreload import ContentWatcher
+from history import History
+from savestore import SaveStore
+from siteexport import (
+    BOX_LABELS,
+    BackgroundWriter,
+    fill_page,
+    open_in_browser,
+    render_board,
+)
+
+# Screen size
+screen_width, screen_height = 768, 1024
+
+# Colors
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+
+# Rendering mode: when True the main loop sleeps until an event arrives and only
+# repaints the regions that changed; set to False to redraw the full frame every pass
+IDLE_AWARE_RENDERING = True
+FPS = 60  # Frame rate cap while something is moving (e.g. a phrase being dragged)
+
+# Decoded icons of the most recently used themes are kept under this memory budget
+ICON_MEMORY_BUDGET = 64 * 1024 * 1024  # bytes
+
+# Worker threads preparing the next board (phrases and decoded icons) in the background
+PREFETCH_WORKERS = 2
+
+# Seconds between two scans of data/ and icons/ for new or changed themes and icons,
+# which are applied while the app runs; None turns the watcher off
+HOT_RELOAD_INTERVAL = 1.0
+RELOAD_EVENT = pygame.event.custom_type()  # Posted by the watcher thread
+
+# Redraws before a phrase or icon set already handed out is accepted again
+HISTORY_ATTEMPTS = 20
+
+# Every save is appended to the save store; an HTML view of it is also written by a
+# background thread when WRITE_HTML_SAVES is set, and opened in the browser afterwards
+WRITE_HTML_SAVES = True
+OPEN_SAVES_IN_BROWSER = True
+
+# How icons are included in HTML saves: "files" links the icon files, "sprites" uses
+# per-theme sprite sheets in saves/sprites, "inline" embeds them as data URIs
+HTML_ASSETS = "files"
+
+# Title text and its vertical offset from the top of the window
+title_text = "And then these thoughts billowed forth...."
+title_y = 20  # Adjust as needed for padding
+
+# Button sizes
+button_width, button_height = 108, 34  # Customize as needed
+button_gap = 10
+
+# Range of the theme weights set with the mouse wheel while blending themes
+MIN_WEIGHT, MAX_WEIGHT = 1, 9
+
+
+# Function to calculate where each icon in the icon row is drawn
+def icon_row_positions(icons, title_font):
+    """
+    Return the top-left position of every icon in the icon row.
+
+    The icons are centered horizontally as a row with a 10px gap between them and
+    placed 20px below the title.
+
+    Args:
+        icons (list): The (surface, path) tuples of the icons.
+        title_font (pygame.font.Font): The font the title is drawn with.
+    """
+    total_icons_width = (
+        sum(icon_surface.get_width() for icon_surface, _ in icons)
+        + (len(icons) - 1) * 10
+    )
+    start_x = (screen_width - total_icons_width) // 2
+    y_position = (
+        title_y + title_font.get_height() + 20
+    )  # Adjust as needed for vertical spacing
+
+    positions = []
+    for icon_surface, _ in icons:
+        positions.append((start_x, y_position))
+        start_x += (
+            icon_surface.get_width() + 10
+        )  # Move to the next position with a 10px gap
+    return positions
+
+
+# Function to draw a board: everything on screen except the buttons
+def draw_board(surface, background, title_font, font, text_cache, phrases, icons):
+    """
+    Draw the background, title, box labels, icon row and phrases of a board.
+
+    Used by `StoryMaker.draw_ui` for the window and by `cardrender` for PNG cards, so
+    both show the same layout.
+
+    Args:
+        surface (pygame.Surface): The window or an offscreen surface of the window size.
+        background (pygame.Surface): The background image.
+        title_font (pygame.font.Font): The font of the title.
+        font (pygame.font.Font): The font of the labels and phrases.
+        text_cache (TextCache): The cache the text is rendered through.
+        phrases (list): The (phrase, position) tuples of the board.
+        icons (list): The (surface, path) tuples of the icon row.
+    """
+    surface.blit(background, (0, 0))
+
+    # Draw title
+    title_surface = text_cache.render(title_font, title_text, BLACK)
+    title_x = (screen_width - title_surface.get_width()) // 2
+    surface.blit(title_surface, (title_x, title_y))
+
+    # Draw labels for boxes
+    for i, label in enumerate(BOX_LABELS):
+        text_surface = text_cache.render(font, label, BLACK)
+        surface.blit(text_surface, (50, i * 100 + 215))
+
+    # Draw icons at their calculated positions
+    positions = icon_row_positions(icons, title_font)
+    for (icon_surface, _), icon_pos in zip(icons, positions):
+        surface.blit(icon_surface, icon_pos)
+
+    # Draw phrases at their current positions
+    for phrase, pos in phrases:
+        text_surface = text_cache.render(font, phrase, BLACK)
+        surface.blit(text_surface, pos)
+
+
+# DataSetButton class
+class DataSetButton:
+    """
+    A class representing a button used for selecting data sets.
+
+    Args:
+        x (int): The x-coordinate of the button's top-left corner.
+        y (int): The y-coordinate of the button's top-left corner.
+        width (int): The width of the button.
+        height (int): The height of the button.
+        text (str): The text displayed on the button.
+
+    Attributes:
+        rect (pygame.Rect): A rectangular area defining the button's position and size.
+        text (str): The text displayed on the button.
+        selected (bool): A flag indicating whether the button is currently selected.
+        weight (int): The theme's weight while it is part of a blend, None otherwise.
+
+    Methods:
+        draw(screen, font, text_cache, small_font=None): Draw the button on the specified
+        Pygame screen; the weight is drawn in its corner with `small_font`.
+        toggle_select(): Toggle the selection state of the button.
+
+    The `DataSetButton` class represents a clickable button with a rectangular shape, text,
+    and a selection state. It is used for selecting data sets. You can create instances of this
+    class and add them to your Pygame user interface.
+
+    Example:
+        # Create a data set button
+        button = DataSetButton(100, 200, 150, 50, "Data Set 1")
+
+        # Draw the button on the Pygame screen
+        button.draw(screen, gothic_font, text_cache)
+
+        # Toggle the button's selection state
+        button.toggle_select()
+    """
+
+    def __init__(self, x, y, width, height, text):
+        self.rect = pygame.Rect(x, y, width, height)
+        self.text = text
+        self.selected = False
+        self.weight = None
+
+    def draw(self, screen, font, text_cache, small_font=None):
+        # Button background and text colors
+        bg_color = BLACK if self.selected else WHITE
+        text_color = WHITE if self.selected else BLACK
+        pygame.draw.rect(screen, bg_color, self.rect)
+        pygame.draw.rect(screen, text_color, self.rect, 1)
+
+        # Render text
+        text_surface = text_cache.render(font, self.text, text_color, self.selected)
+
+        # Calculate text position for vertical centering
+        text_x = self.rect.x + (self.rect.width - text_surface.get_width()) // 2
+        text_y = self.rect.y + (self.rect.height - text_surface.get_height()) // 2
+
+        # Draw text
+        screen.blit(text_surface, (text_x, text_y))
+
+        # Draw the blend weight in the top-right corner
+        if self.weight is not None and small_font is not None:
+            weight_surface = text_cache.render(small_font, str(self.weight), text_color)
+            screen.blit(
+                weight_surface,
+                (self.rect.right - weight_surface.get_width() - 3, self.rect.y + 2),
+            )
+
+    def toggle_select(self):
+        self.selected = not self.selected
+
+
+# StoryMaker class
+class StoryMaker:
+    """
+    The story board application: its state, its drawing and its event handling.
+
+    Creating a `StoryMaker` does no I/O and starts no pygame subsystem. Everything is
+    set up on first use instead: the window (and only the display and font subsystems)
+    when `screen` is first drawn to, the fonts and background when the first frame is
+    drawn, the word bank and icons when the first board is generated. The generation
+    logic can therefore be used from tests and services without a window.
+
+    Attributes:
+        current_theme (str): The currently selected theme for generating phrases and icons.
+        current_categories (list): The word categories joined to build each phrase.
+        dragging (bool): A flag indicating whether a phrase is currently being dragged.
+        dragged_phrase_index (int): The index of the currently dragged phrase in `phrases`.
+        phrases (list): The (phrase, position) tuples on the board.
+        random_icons (list): The (surface, path) tuples of the icons on the board.
+        blend_weights (dict): The weight of every blended theme, empty unless several
+        themes are selected with ctrl-click.
+
+    Example:
+        # Generate a board without opening a window
+        app = StoryMaker()
+        print(app.generate_phrases())
+
+        # Open the window and run until it is closed
+        StoryMaker().run()
+    """
+
+    def __init__(self):
+        # Theme and category selection defaults
+        self.current_theme = "Introduce"
+        self.current_categories = ["DescriptiveWords", "Nouns", "Actions"]
+
+        # Drag and drop variables
+        self.dragging = False
+        self.dragged_phrase_index = None
+
+        # Button variables
+        self.save_button = pygame.Rect(50, 700, 100, 30)
+        self.generate_button = pygame.Rect(160, 700, 100, 30)
+
+        # Board ID box: shows the ID of the board, click it to type an ID to jump to
+        self.id_box = pygame.Rect(270, 700, 448, 30)
+        self.id_input = None  # The text typed so far, None while not editing
+        self.id_error = False
+
+        # Word indexes of every phrase text handed out, so a board can be encoded
+        self.phrase_words = {}
+
+        # Record number of the saved board on screen while browsing saves
+        self.save_number = None
+
+        # Weights of the blended themes, empty while a single theme is selected
+        self.blend_weights = {}
+        self._blend = None  # ThemeBlend of blend_weights, built on first use
+
+        # Phrase candidates handed over by the prefetcher, by theme, and the theme
+        # button under the pointer, whose board is prepared in the background
+        self.prefetched_words = {}
+        self.hovered_button = None
+
+        # Cache of rendered text surfaces, nearly all text is identical from frame to frame
+        self.text_cache = TextCache(max_entries=256)
+        self.icon_cache = IconCache(memory_budget=ICON_MEMORY_BUDGET)
+
+        # Regions of the screen that need repainting on the next frame
+        self.dirty_rects = []
+        self.full_redraw = True
+        self.clock = pygame.time.Clock()
+
+        # Set to a profiler.FrameProfiler attached to this app to record frame timings
+        self.profiler = None
+
+    # Lazily initialized resources
+
+    @cached_property
+    def screen(self):
+        # Only the subsystems the board needs; pygame.init() would also start audio,
+        # joystick and others
+        pygame.display.init()
+        pygame.font.init()
+        return pygame.display.set_mode((screen_width, screen_height))
+
+    @cached_property
+    def gothic_font(self):
+        pygame.font.init()
+        return pygame.font.Font("fonts/CaslonAntique.ttf", 26)
+
+    @cached_property
+    def title_font(self):
+        pygame.font.init()
+        return pygame.font.Font("fonts/Almendra-Regular.ttf", 36)
+
+    @cached_property
+    def small_font(self):
+        pygame.font.init()
+        return pygame.font.Font(None, 18)  # pygame's default font, for blend weights
+
+    @cached_property
+    def background_image(self):
+        image = pygame.image.load("bg/bg.png")
+        if pygame.display.get_surface() is not None:
+            image = image.convert()  # Display format, so every frame blits without converting
+        return image
+
+    @cached_property
+    def word_bank(self):
+        # Compiled word lists of every theme, memory-mapped and rebuilt when data/*.json changes
+        return open_word_bank()
+
+    @cached_property
+    def data(self):
+        return self.load_data(self.current_theme.lower() + ".json")  # Initial data load
+
+    @cached_property
+    def prefetcher(self):
+        return BoardPrefetcher(
+            self.icon_cache,
+            self.word_bank,
+            self.current_categories,
+            workers=PREFETCH_WORKERS,
+        )
+
+    @cached_property
+    def watcher(self):
+        def post(changes):
+            pygame.event.post(pygame.event.Event(RELOAD_EVENT, changes=changes))
+
+        return ContentWatcher(post, interval=HOT_RELOAD_INTERVAL)
+
+    @cached_property
+    def history(self):
+        # Everything generated so far, so Generate does not hand out the same phrases twice
+        return History()
+
+    @cached_property
+    def board_codec(self):
+        return BoardCodec(self.word_bank, self.current_categories)
+
+    @cached_property
+    def save_store(self):
+        # Every saved board, browsable with Page Up / Page Down
+        return SaveStore()
+
+    @cached_property
+    def html_assets(self):
+        from assetpack import make_assets  # Pillow is only loaded when first saving
+
+        return make_assets(HTML_ASSETS, "saves")
+
+    @cached_property
+    def save_writer(self):
+        return BackgroundWriter()
+
+    @cached_property
+    def phrases(self):
+        return self.generate_phrases()
+
+    @cached_property
+    def random_icons(self):
+        return self.generate_icons()
+
+    @cached_property
+    def data_set_buttons(self):
+        # Dropdown options with capitalized names
+        dropdown_options = [
+            f.replace(".json", "") for f in os.listdir("data") if f.endswith(".json")
+        ]
+        data_set_buttons = []
+        for i, option in enumerate(dropdown_options):
+            x = (i % 6) * (button_width + button_gap) + 50  # Adjust starting x-position
+            y = (i // 6) * (button_height + button_gap) + 750  # Adjust starting y-position
+            data_set_buttons.append(
+                DataSetButton(x, y, button_width, button_height, option)
+            )
+        return data_set_buttons
+
+    # Load data sets
+    def load_data(self, file_name):
+        # Served from the word bank, so switching themes does not touch the disk
+        return self.word_bank.load(file_name)
+
+    # Function to generate random phrases with a default theme of "Introduce"
+    def generate_phrases(self):
+        """
+        Generate random phrases based on the current theme.
+
+        Returns:
+            list: A list of generated phrases, each represented as a tuple containing the phrase text
+            and its initial position on the screen.
+
+        The function generates random phrases by selecting words from categories associated with the
+        current theme. It constructs phrases by randomly selecting words from each category and
+        joining them together. The resulting phrases are stored as tuples with their initial screen
+        positions. Phrases found in `history` are drawn again, so a phrase is only handed out
+        once per theme until the theme runs out of combinations.
+
+        Example:
+            To generate phrases with the default theme:
+            >>> phrases = app.generate_phrases()
+
+            To generate phrases with a specific theme:
+            >>> app.current_theme = "Medieval"
+            >>> app.data = app.load_data("medieval.json")
+            >>> phrases = app.generate_phrases()
+        """
+        if self.blend_weights:
+            return self.generate_blended_phrases()
+
+        phrases = []
+        theme_key = self.current_theme.capitalize()
+        words = self.data[theme_key]
+        lengths = [len(words[category]) for category in self.current_categories]
+        codec = self.board_codec
+        # Candidates drawn ahead by the prefetcher are used first
+        candidates = iter(self.prefetched_words.pop(theme_key, ()))
+        for _ in range(5):
+            # Words are drawn as indexes, which is what a board ID is made of
+            indices = self.history.draw_unseen(
+                lambda: next(candidates, None)
+                or tuple(random.randrange(length) for length in lengths),
+                key=lambda indices: f"phrase:{theme_key}:"
+                + codec.phrases(theme_key, [indices])[0],
+                attempts=HISTORY_ATTEMPTS,
+            )
+            phrase = codec.phrases(theme_key, [indices])[0]
+            self.phrase_words[phrase] = indices
+            phrases.append(
+                (phrase, (screen_width - 500, _ * 100 + 215))
+            )  # Store phrase with its initial position
+        return phrases
+
+    # Updated generate_icons function with a default theme of "Medieval"
+    def generate_icons(self, num_icons=5):
+        """
+        Generate a random selection of icons associated with the current theme.
+
+        Args:
+            num_icons (int, optional): The number of icons to generate. Defaults to 5.
+
+        Returns:
+            list: A list of tuples, each containing a loaded image object and the file path
+            of the corresponding icon.
+
+        The icons come from `icon_cache`, which loads each theme's folder once and keeps
+        the decoded surfaces in memory, so after the first call for a theme this is a pure
+        random pick without disk I/O. If the theme directory does not exist, it falls back
+        to the "Medieval" theme.
+
+        Example:
+            To generate a list of 5 icons for the current theme:
+            >>> icons = app.generate_icons()
+
+            To generate a custom number of icons:
+            >>> icons = app.generate_icons(num_icons=10)
+        """
+
+        def draw():
+            if self.blend_weights:
+                return self.sample_blended_icons(num_icons)
+            return self.icon_cache.sample(self.current_theme, num_icons)
+
+        # Redraw icon combinations that were already handed out
+        return self.history.draw_unseen(
+            draw,
+            key=lambda icons: "icons:" + "|".join(sorted(path for _, path in icons)),
+            attempts=HISTORY_ATTEMPTS,
+        )
+
+    def blend(self):
+        """
+        Return the `ThemeBlend` of the selected themes, built again only after the
+        selection or a weight changed.
+        """
+        if self._blend is None:
+            self._blend = ThemeBlend(
+                {theme: self.word_bank[theme] for theme in self.blend_weights},
+                self.blend_weights,
+                self.current_categories,
+            )
+        return self._blend
+
+    def theme_label(self):
+        """
+        Return the name of the theme on screen, e.g. "Medieval" or "Medieval*3+Monsters".
+
+        A blend is named by its themes joined with "+", each followed by "*" and its
+        weight unless the weight is 1; `show_saved` reads the weights back from it.
+        """
+        if self.blend_weights:
+            return "+".join(
+                theme if weight == 1 else f"{theme}*{weight}"
+                for theme, weight in self.blend_weights.items()
+            )
+        return self.current_theme
+
+    def generate_blended_phrases(self):
+        """
+        Generate five phrases from the weighted blend of the selected themes.
+
+        Every word is drawn from a theme picked by weight, see `storyseeds.ThemeBlend`,
+        so a draw costs the same however many themes are blended.
+        """
+        blend = self.blend()
+        label = "+".join(self.blend_weights)  # Reweighting keeps the seen phrases
+        phrases = []
+        for i in range(5):
+            phrase = self.history.draw_unseen(
+                blend.phrase,
+                key=lambda phrase: f"phrase:{label}:{phrase}",
+                attempts=HISTORY_ATTEMPTS,
+            )
+            phrases.append((phrase, (screen_width - 500, i * 100 + 215)))
+        return phrases
+
+    def sample_blended_icons(self, num_icons=5):
+        """
+        Pick distinct icons, each from a theme drawn by the blend weights.
+        """
+        blend = self.blend()
+        icons = []
+        paths = set()
+        for _ in range(num_icons * 10):  # Gives up on blends with too few icons
+            if len(icons) == num_icons:
+                break
+            theme_icons = self.icon_cache.icons(blend.theme())
+            if theme_icons:
+                icon = random.choice(theme_icons)
+                if icon[1] not in paths:
+                    paths.add(icon[1])
+                    icons.append(icon)
+        return icons
+
+    # Function to calculate where each icon in the icon row is drawn
+    def icon_positions(self):
+        """
+        Calculate the top-left screen position of every icon in the icon row.
+
+        The icons are centered horizontally as a row with a 10px gap between them and
+        placed 20px below the title.
+
+        Returns:
+            list: A list of (x, y) tuples, one for each entry in `random_icons`.
+        """
+        return icon_row_positions(self.random_icons, self.title_font)
+
+    def icon_row_rect(self):
+        """
+        Return the screen area covered by the icon row, spanning the full window width.
+
+        The full width is used so that a new set of icons with a different total width
+        also clears whatever the previous set left behind.
+        """
+        y_position = title_y + self.title_font.get_height() + 20
+        row_height = max(
+            (icon_surface.get_height() for icon_surface, _ in self.random_icons),
+            default=0,
+        )
+        return pygame.Rect(0, y_position, screen_width, row_height)
+
+    def phrase_rect(self, index):
+        """
+        Return the screen area covered by the phrase at `index` in the `phrases` list.
+        """
+        phrase, pos = self.phrases[index]
+        return pygame.Rect(pos, self.gothic_font.size(phrase))
+
+    def mark_dirty(self, rect=None):
+        """
+        Queue a region of the screen for repainting on the next frame.
+
+        Args:
+            rect (pygame.Rect, optional): The area that changed. When omitted the whole
+            window is repainted.
+        """
+        if rect is None:
+            self.full_redraw = True
+        else:
+            self.dirty_rects.append(pygame.Rect(rect))
+
+    def render_dirty(self):
+        """
+        Repaint the queued dirty regions and push only those regions to the display.
+
+        All queued rectangles are merged into one clip area so `draw_ui` runs once per
+        frame; blits outside the clip area are discarded by SDL. Does nothing when no
+        region is queued.
+        """
+        screen = self.screen
+        if self.full_redraw:
+            screen.set_clip(None)
+            self.draw_ui()
+            pygame.display.flip()
+        elif self.dirty_rects:
+            dirty_rects = self.dirty_rects
+            clip = dirty_rects[0].unionall(dirty_rects[1:]).clip(screen.get_rect())
+            screen.set_clip(clip)
+            self.draw_ui()
+            screen.set_clip(None)
+            pygame.display.update(dirty_rects)
+        self.full_redraw = False
+        self.dirty_rects.clear()
+
+    # Function to draw the UI elements
+    def draw_ui(self):
+        """
+        Draw the user interface elements on the Pygame screen.
+
+        This function is responsible for rendering various UI elements on the Pygame screen, including
+        the background image, title, labels, icons, phrases, buttons, and data set buttons. It creates a
+        visually appealing and interactive user interface for the application.
+
+        The first call opens the window and loads the fonts, the background image and
+        the first board.
+
+        Example:
+            # Draw a frame and show it
+            app.draw_ui()
+            pygame.display.flip()
+        """
+        screen = self.screen
+        text_cache = self.text_cache
+        gothic_font = self.gothic_font
+        draw_board(
+            screen,
+            self.background_image,
+            self.title_font,
+            gothic_font,
+            text_cache,
+            self.phrases,
+            self.random_icons,
+        )
+
+        # Draw buttons with text centered
+        for button, button_text in [
+            (self.save_button, "Save"),
+            (self.generate_button, "Generate"),
+        ]:
+            pygame.draw.rect(screen, WHITE, button)
+            pygame.draw.rect(screen, BLACK, button, 1)
+            button_text_surface = text_cache.render(gothic_font, button_text, BLACK)
+            text_x = button.x + (button.width - button_text_surface.get_width()) // 2
+            text_y = button.y + (button.height - button_text_surface.get_height()) // 2
+            screen.blit(button_text_surface, (text_x, text_y))
+
+        # Draw the board ID, or the ID being typed
+        if self.id_input is None:
+            id_text, id_color = self.board_id(), BLACK
+        else:
+            id_text = self.id_input + "_"
+            id_color = (160, 0, 0) if self.id_error else BLACK
+        pygame.draw.rect(screen, WHITE, self.id_box)
+        border = 1 if self.id_input is None else 2  # Thicker while typing
+        pygame.draw.rect(screen, BLACK, self.id_box, border)
+        id_surface = text_cache.render(gothic_font, id_text, id_color)
+        screen.blit(
+            id_surface,
+            (
+                self.id_box.x + 8,
+                self.id_box.y + (self.id_box.height - id_surface.get_height()) // 2,
+            ),
+        )
+
+        # Draw data set buttons
+        for button in self.data_set_buttons:
+            button.draw(screen, gothic_font, text_cache, self.small_font)
+
+    def save_state(self):
+        """
+        Save the current board to the save store, and as an HTML file opened in a web browser.
+
+        The board (theme, phrases with their positions and word indexes, icon paths) is
+        appended to `save_store`, from where it can be reopened with `show_saved`.
+
+        This function also creates an HTML file containing the current state of the application, including
+        selected icons and phrases. The file is saved with a timestamp and can be opened in a web
+        browser for viewing. If the theme-specific icon folder does not exist, it falls back to the
+        "Medieval" theme.
+
+        The HTML content is generated based on the current state of the application, including icons
+        and phrases. The content is embedded in an HTML template that includes a title and
+        background styling.
+
+        The page is rendered with `siteexport.render_board` by `save_writer` on its
+        background thread, which can take a moment the first time sprite sheets are
+        packed, then written and opened when `OPEN_SAVES_IN_BROWSER` is set. No page is written when `WRITE_HTML_SAVES` is
+        off; `python savestore.py export` derives the pages from the store instead.
+
+        Returns:
+            str: The path of the HTML file, which may not be written yet, or None when
+            `WRITE_HTML_SAVES` is off.
+
+        Example:
+            # Save the current board as an HTML file and open it in a browser
+            app.save_state()
+        """
+        phrases_sorted = sorted(
+            self.phrases, key=lambda x: x[1][1]
+        )  # Sort phrases by their y-position
+        self.save_number = self.save_store.append(
+            {
+                "theme": self.theme_label(),
+                "phrases": [phrase for phrase, _ in phrases_sorted],
+                "positions": [pos for _, pos in phrases_sorted],
+                "words": [
+                    self.phrase_words.get(phrase, ()) for phrase, _ in phrases_sorted
+                ],
+                "icons": [path for _, path in self.random_icons],
+            }
+        )
+        self.save_store.flush()  # On disk right away, in case the app is killed
+        if not WRITE_HTML_SAVES:
+            return None
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d%H%M%S")
+        file_name = f"{self.current_theme}_{timestamp}.html"
+        file_path = os.path.join("saves", file_name)
+        icon_paths = [path for _, path in self.random_icons]  # Access the icon's path
+        phrases = [phrase for phrase, _ in phrases_sorted]
+        title = html.escape(self.theme_label())
+        assets = self.html_assets
+
+        def render_page():
+            board_html = render_board(
+                phrases, icon_paths, labels=BOX_LABELS, assets=assets
+            )
+            head = assets.head_html(icon_paths, "saves") if assets is not None else ""
+            return fill_page(title, board_html, head=head)
+
+        # The page is rendered, written and opened by the writer thread, so the window
+        # never stalls, not even while sprite sheets are packed
+        self.save_writer.write(
+            file_path,
+            render_page,
+            then=open_in_browser if OPEN_SAVES_IN_BROWSER else None,
+        )
+        return file_path
+
+    def board_id(self):
+        """
+        Return the base32 ID of the board on screen.
+
+        The phrases are taken from top to bottom, the order `save_state` uses, so
+        rearranging them changes the ID. Opening the ID with `show_board` rebuilds the
+        board with the phrases in that order at their initial positions.
+
+        Example:
+            >>> app.board_id()
+            'T6QWX4T4WHKH11PF0FMVW4E674GN'
+        """
+        if self.blend_weights:
+            return ""  # IDs describe boards of a single theme
+        codec = self.board_codec
+        theme = self.current_theme.capitalize()
+        phrases_sorted = sorted(self.phrases, key=lambda x: x[1][1])
+        if any(not self.phrase_words.get(phrase) for phrase, _ in phrases_sorted):
+            return ""  # A saved board from before words were recorded
+        icon_index = {path: i for i, path in enumerate(codec.icon_paths(theme))}
+        if any(path not in icon_index for _, path in self.random_icons):
+            return ""  # The theme's icon folder changed since the board was drawn
+        return to_base32(
+            codec.encode(
+                theme,
+                [self.phrase_words[phrase] for phrase, _ in phrases_sorted],
+                [icon_index[path] for _, path in self.random_icons],
+            )
+        )
+
+    def show_board(self, board_id):
+        """
+        Replace the board on screen with the board of a base32 ID.
+
+        Args:
+            board_id (str): The ID, as returned by `board_id`.
+
+        Raises:
+            ValueError: If the text is not a valid board ID.
+        """
+        theme, word_indices, icon_indices = self.board_codec.decode(
+            from_base32(board_id)
+        )
+        self.mark_board_dirty()
+        self.forget_phrase_text()
+        self.select_themes({theme: 1})
+        phrases = self.board_codec.phrases(theme, word_indices)
+        self.phrase_words.update(zip(phrases, word_indices))
+        self.phrases[:] = [
+            (phrase, (screen_width - 500, i * 100 + 215))
+            for i, phrase in enumerate(phrases)
+        ]
+        icons = self.icon_cache.icons(theme)
+        self.random_icons = [icons[i] for i in icon_indices]
+        self.save_number = None
+        self.mark_board_dirty()
+
+    def show_saved(self, number):
+        """
+        Replace the board on screen with a board from the save store.
+
+        Args:
+            number (int): The record number of the saved board, as returned by
+            `save_store.append`; negative numbers count back from the latest save.
+        """
+        board = self.save_store[number]
+        self.save_number = number % len(self.save_store)
+        weights = {}  # Blends are saved as "Medieval*3+Monsters", see `theme_label`
+        for part in board["theme"].split("+"):
+            theme, _, weight = part.partition("*")
+            weights[theme] = int(weight or 1)
+        themes = list(weights)
+        self.mark_board_dirty()
+        self.forget_phrase_text()
+        self.select_themes(weights)
+        for phrase, indices in zip(board["phrases"], board["words"]):
+            if indices:
+                self.phrase_words[phrase] = indices
+        self.phrases[:] = list(zip(board["phrases"], board["positions"]))
+        icons = {}
+        for theme in themes:
+            icons.update(self.icon_cache.find(theme, board["icons"]))
+        self.random_icons = [icons[path] for path in board["icons"] if path in icons]
+        self.mark_board_dirty()
+
+    def new_board(self):
+        """
+        Replace the phrases and icons on screen with newly generated ones.
+
+        Whatever the prefetcher prepared for the selected themes is swapped in, so
+        usually no word list or icon has to be read here, and the board after this one
+        is prepared in the background.
+        """
+        self.mark_board_dirty()
+        self.forget_phrase_text()
+        themes = list(self.blend_weights) or [self.current_theme]
+        for theme in themes:
+            self.prefetched_words[theme] = self.prefetcher.take(theme)
+        self.phrases[:] = self.generate_phrases()
+        self.save_number = None
+        self.random_icons = self.generate_icons()
+        self.prefetched_words.clear()
+        self.mark_board_dirty()
+        for theme in themes:
+            self.prefetcher.prepare(theme)
+
+    def select_themes(self, weights):
+        """
+        Select the themes boards are drawn from and update the theme buttons.
+
+        Args:
+            weights (dict): The weight of every selected theme. With a single theme the
+            board is drawn from that theme alone; with several it is drawn from their
+            weighted blend, see `generate_blended_phrases`.
+        """
+        if self.current_theme not in weights:
+            self.current_theme = next(iter(weights))
+        self.data = self.load_data(
+            self.current_theme.lower() + ".json"
+        )  # Assuming the file names are lowercase
+        self.blend_weights = dict(weights) if len(weights) > 1 else {}
+        self._blend = None  # Rebuilt with the new weights on the next draw
+        for button in self.data_set_buttons:
+            theme = button.text.capitalize()  # This ensures the first letter is capitalized
+            selected = theme in weights
+            weight = self.blend_weights.get(theme)
+            if button.selected != selected or button.weight != weight:
+                button.selected = selected
+                button.weight = weight
+                self.mark_dirty(button.rect)
+
+    def toggle_blend(self, theme):
+        """
+        Add a theme to the blend of selected themes with weight 1, or take it out.
+
+        The last selected theme cannot be taken out.
+        """
+        weights = dict(self.blend_weights) or {self.current_theme: 1}
+        if theme in weights:
+            if len(weights) == 1:
+                return
+            del weights[theme]
+        else:
+            weights[theme] = 1
+        self.select_themes(weights)
+
+    def adjust_weight(self, pos, step):
+        """
+        Change the blend weight of the theme whose button is under `pos` by `step`.
+        """
+        for button in self.data_set_buttons:
+            theme = button.text.capitalize()
+            if button.rect.collidepoint(pos) and theme in self.blend_weights:
+                weights = dict(self.blend_weights)
+                weights[theme] = min(max(weights[theme] + step, MIN_WEIGHT), MAX_WEIGHT)
+                self.select_themes(weights)
+                break
+
+    def browse_saves(self, step):
+        """
+        Show the saved board `step` records after the one on screen (before it when
+        negative), starting from the latest save.
+        """
+        count = len(self.save_store)
+        if not count:
+            return
+        if self.save_number is None:
+            number = count - 1 if step < 0 else 0
+        else:
+            number = min(max(self.save_number + step, 0), count - 1)
+        self.show_saved(number)
+
+    def handle_id_input(self, event):
+        """
+        Edit the ID typed into the board ID box; Enter jumps to it, Escape cancels.
+        """
+        if event.key == pygame.K_RETURN or event.key == pygame.K_KP_ENTER:
+            try:
+                self.show_board(self.id_input)
+            except ValueError:
+                self.id_error = True
+            else:
+                self.id_input = None
+        elif event.key == pygame.K_ESCAPE:
+            self.id_input = None
+        elif event.key == pygame.K_BACKSPACE:
+            self.id_input = self.id_input[:-1]
+            self.id_error = False
+        elif event.unicode and len(self.id_input) < 32:
+            char = event.unicode.upper()
+            if char.isalnum() or char == "-":
+                self.id_input += char
+                self.id_error = False
+        self.mark_dirty(self.id_box)
+
+    def mark_board_dirty(self):
+        """
+        Queue the icon row, every phrase at its current position and the board ID for
+        repainting.
+
+        Call it both before and after replacing `phrases` or `random_icons` so the old
+        content is erased and the new content is drawn.
+        """
+        self.mark_dirty(self.icon_row_rect())
+        self.mark_dirty(self.id_box)
+        for i in range(len(self.phrases)):
+            self.mark_dirty(self.phrase_rect(i))
+
+    def forget_phrase_text(self):
+        """
+        Drop the cached text surfaces of the current phrases before they are replaced.
+
+        Generated phrases rarely come back, so keeping their surfaces would only push the
+        title, labels and button captions out of the text cache.
+        """
+        for phrase, _ in self.phrases:
+            self.text_cache.invalidate(phrase)
+            self.phrase_words.pop(phrase, None)
+
+    # Function to handle phrase dragging and button interactions
+    def handle_dragging(self, event):
+        """
+        Handle phrase dragging and button interactions in the application.
+
+        This function is responsible for managing interactions when the user clicks and drags phrases or
+        interacts with buttons on the screen. It detects button clicks, initiates phrase dragging, and
+        handles button actions such as saving, generating, and selecting data sets. Ctrl-clicking a
+        data set adds it to (or removes it from) the blend of selected themes, and the mouse wheel
+        over a blended data set changes its weight.
+
+        Args:
+            event (pygame.Event): The Pygame event representing user input.
+
+        Attributes changed:
+            dragging (bool): A flag indicating whether a phrase is currently being dragged.
+            dragged_phrase_index (int): The index of the currently dragged phrase in the 'phrases' list.
+            current_theme (str): The currently selected theme for generating phrases and icons.
+            data (dict): The data loaded for the current theme.
+            random_icons (list): The list of randomly selected icons for the current theme.
+            blend_weights (dict): The weights of the blended themes.
+
+        Example:
+            # Feed the pending Pygame events to the application
+            for event in pygame.event.get():
+                app.handle_dragging(event)
+        """
+        if event.type == pygame.KEYDOWN and self.id_input is not None:
+            self.handle_id_input(event)
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_PAGEUP:
+            self.browse_saves(-1)  # Older save
+        elif event.type == pygame.KEYDOWN and event.key == pygame.K_PAGEDOWN:
+            self.browse_saves(1)  # Newer save
+        elif event.type == pygame.MOUSEWHEEL:
+            self.adjust_weight(pygame.mouse.get_pos(), event.y)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button not in (4, 5):
+            if self.id_input is not None and not self.id_box.collidepoint(event.pos):
+                self.id_input = None  # Clicking elsewhere cancels typing an ID
+                self.mark_dirty(self.id_box)
+            if self.id_box.collidepoint(event.pos):
+                self.id_input = ""
+                self.id_error = False
+                self.mark_dirty(self.id_box)
+            elif self.save_button.collidepoint(event.pos):
+                self.save_state()
+            elif self.generate_button.collidepoint(event.pos):
+                self.new_board()
+            else:
+                for button in self.data_set_buttons:
+                    if button.rect.collidepoint(event.pos):
+                        theme = button.text.capitalize()
+                        if pygame.key.get_mods() & pygame.KMOD_CTRL:
+                            self.toggle_blend(theme)  # Ctrl-click blends themes
+                        else:
+                            # Select only this theme and deselect all other buttons
+                            self.select_themes({theme: 1})
+                        self.new_board()
+                        break
+                for i, (phrase, pos) in enumerate(self.phrases):
+                    if pygame.Rect(pos, self.gothic_font.size(phrase)).collidepoint(
+                        event.pos
+                    ):
+                        self.dragging = True
+                        self.dragged_phrase_index = i
+                        break
+        elif event.type == pygame.MOUSEBUTTONUP:
+            if self.dragging:
+                self.mark_dirty(self.id_box)  # Reordered phrases change the board ID
+            self.dragging = False
+            self.dragged_phrase_index = None
+        elif event.type == pygame.MOUSEMOTION and self.dragging:
+            if self.dragged_phrase_index is not None:
+                index = self.dragged_phrase_index
+                self.mark_dirty(self.phrase_rect(index))
+                self.phrases[index] = (self.phrases[index][0], event.pos)
+                self.mark_dirty(self.phrase_rect(index))
+        elif event.type == pygame.MOUSEMOTION:
+            self.handle_hover(event.pos)
+
+    def handle_hover(self, pos):
+        """
+        Start preparing a board of the theme whose button the pointer moved onto, so a
+        click on it finds the board ready.
+        """
+        button = self.hovered_button
+        if button is not None and button.rect.collidepoint(pos):
+            return
+        self.hovered_button = None
+        for button in self.data_set_buttons:
+            if button.rect.collidepoint(pos):
+                self.hovered_button = button
+                self.prefetcher.prepare(button.text.capitalize())
+                break
+
+    def apply_changes(self, changes):
+        """
+        Apply theme and icon changes reported by the watcher, see `hotreload`.
+
+        Only what a change touches is updated: the themes of a changed JSON file are
+        swapped in the word bank, a changed icon folder is dropped from the icon cache
+        and the sprite sheets, and the theme buttons are rebuilt when themes were added
+        or removed. The board on screen stays unless its theme was removed.
+
+        Args:
+            changes (dict): The changes of one scan, with "data" and "icons" keys.
+        """
+        themes = set()
+        if "word_bank" in self.__dict__:  # Otherwise it is compiled afresh when opened
+            for file_name, file_data in changes.get("data", {}).items():
+                themes |= self.word_bank.update(file_name, file_data)
+        for folder in changes.get("icons", ()):
+            self.icon_cache.invalidate(folder)
+            if self.__dict__.get("html_assets") is not None:
+                self.html_assets.invalidate(os.path.join("icons", folder))
+        if not themes and "icons" not in changes:
+            return
+
+        self.__dict__.pop("board_codec", None)  # Built again with the new lists
+        self._blend = None
+        if "prefetcher" in self.__dict__:
+            if "icons" in changes:
+                self.prefetcher.discard()  # Several themes may share an icon folder
+            for theme in themes:
+                self.prefetcher.discard(theme)
+        if self.current_theme in themes:
+            self.phrase_words.clear()  # The word indexes on screen no longer apply
+            self.mark_dirty(self.id_box)
+        names = {button.text for button in self.data_set_buttons}
+        if any(
+            file_data is None or file_name[: -len(".json")] not in names
+            for file_name, file_data in changes.get("data", {}).items()
+        ):
+            # Buttons for added themes, none for removed ones
+            self.__dict__.pop("data_set_buttons", None)
+            self.hovered_button = None
+            self.mark_dirty()
+
+        weights = self.blend_weights or {self.current_theme: 1}
+        available = {
+            theme: weight
+            for theme, weight in weights.items()
+            if self.load_data(theme.lower() + ".json")
+        }
+        if not available:
+            available = {self.data_set_buttons[0].text.capitalize(): 1}
+        self.select_themes(available)  # Also reloads the current theme's data
+        if available.keys() != weights.keys():
+            self.new_board()
+
+    # Main loop
+    def run(self, startup_report=False):
+        """
+        Open the window and handle events until it is closed.
+
+        Args:
+            startup_report (bool, optional): Print the time from process start to the
+            first frame on screen and return right after that frame. Defaults to False.
+        """
+        running = True
+        first_frame = True
+        profiler = self.profiler
+        while running:
+            if (
+                IDLE_AWARE_RENDERING
+                and not first_frame
+                and not self.dragging
+                and not self.full_redraw
+                and not self.dirty_rects
+            ):
+                # Nothing is moving, so sleep until the next event instead of spinning
+                events = [pygame.event.wait()] + pygame.event.get()
+            else:
+                events = pygame.event.get() if not first_frame else []
+
+            if profiler is not None:
+                profiler.begin_frame(events)
+
+            for event in events:
+                if event.type == pygame.QUIT:
+                    running = False
+                elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                    self.mark_dirty()
+                elif event.type == RELOAD_EVENT:
+                    self.apply_changes(event.changes)
+
+                self.handle_dragging(event)
+
+            if IDLE_AWARE_RENDERING:
+                self.render_dirty()
+                if self.dragging:
+                    self.clock.tick(FPS)  # Steady frame rate while a phrase follows the mouse
+            else:
+                self.mark_dirty()  # Redraw and flip the whole window every frame
+                self.render_dirty()
+
+            if profiler is not None:
+                profiler.end_frame()
+
+            if first_frame:
+                first_frame = False
+                # The first board is on screen, prepare the next one in the background
+                self.prefetcher.prepare(self.current_theme)
+                if HOT_RELOAD_INTERVAL:
+                    self.watcher  # Starts watching data/ and icons/
+                if startup_report:
+                    elapsed = time.perf_counter() - process_start
+                    print(f"time to first frame: {elapsed * 1000:.1f} ms")
+                    running = False
+
+    def close(self):
+        """
+        Finish pending saves, flush the history and shut pygame down.
+        """
+        if "watcher" in self.__dict__:
+            self.watcher.close()
+        if "prefetcher" in self.__dict__:
+            self.prefetcher.close()
+        if "save_writer" in self.__dict__:
+            self.save_writer.close()  # Finish writing any pending saves
+        if "history" in self.__dict__:
+            self.history.close()
+        if "save_store" in self.__dict__:
+            self.save_store.close()
+        if "word_bank" in self.__dict__:
+            self.word_bank.close()
+        pygame.quit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Story board generator.")
+    parser.add_argument(
+        "--startup-time",
+        action="store_true",
+        help="print the time to the first frame and exit",
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const="storymaker_trace.json",
+        metavar="TRACE",
+        help="record frame timings (F3 shows them) and write a Chrome trace on exit",
+    )
+    args = parser.parse_args(argv)
+
+    app = StoryMaker()
+    if args.profile:
+        from profiler import FrameProfiler
+
+        app.profiler = FrameProfiler().attach(app)
+    try:
+        app.run(startup_report=args.startup_time)
+    finally:
+        if app.profiler is not None:
+            print(f"wrote {app.profiler.write_trace(args.profile)}")
+        app.close()
+
+
+if __name__ == "__main__":
+    main()
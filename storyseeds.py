@@ -0,0 +1,568 @@
+"""
+Display-free story seed generation, shared by storymaker.py and the batch command line.
+
+Run it directly to generate seeds in bulk without opening a window:
+
+    python storyseeds.py --count 1000000 --seed 42 --themes Medieval Monsters -o seeds.jsonl
+    python storyseeds.py --count 1000000 --seed 42 --sampler numpy -o seeds.jsonl
+    python storyseeds.py --benchmark
+
+Every seed is written as one JSON line holding the theme, five phrases and five icon
+paths. The work is split into fixed-size chunks and every chunk gets its own NumPy random
+stream derived from the seed and the chunk number, so the output for a given seed is
+identical no matter how many worker processes are used. The "python" sampler draws
+from that stream one number at a time and the "numpy" sampler in a few array calls, in
+the same order, so both write the same seeds; `--benchmark` checks that they do.
+"""
+
+import os
+import sys
+import json
+import glob
+import random
+import argparse
+import multiprocessing
+
+try:
+    import numpy as np
+except ImportError:  # numpy is only needed to generate seeds in bulk
+    np = None
+
+from wordbank import DEFAULT_PATH, WordBank, open_word_bank
+
+# Categories joined together to build each phrase
+DEFAULT_CATEGORIES = ["DescriptiveWords", "Nouns", "Actions"]
+
+# Theme used when a theme has no icon folder of its own
+FALLBACK_THEME = "Medieval"
+
+
+def icon_folder(theme, icons_dir="icons"):
+    """
+    Return the icon folder used for a theme, falling back to the "Medieval" folder.
+
+    Args:
+        theme (str): The theme name, e.g. "Monsters".
+        icons_dir (str, optional): The root folder holding one sub-folder per theme.
+        Defaults to "icons".
+
+    Returns:
+        str: The name of the sub-folder of `icons_dir` that holds the theme's icons.
+    """
+    if os.path.exists(os.path.join(icons_dir, theme)):
+        return theme
+    return FALLBACK_THEME
+
+
+def icon_files(folder, icons_dir="icons"):
+    """
+    Return the sorted paths of every icon in one icon folder.
+
+    The list is sorted so that an icon index means the same file on every machine.
+    """
+    return sorted(glob.glob(os.path.join(icons_dir, folder, "*.png")))
+
+
+def generate_phrase_texts(
+    words, categories=DEFAULT_CATEGORIES, num_phrases=5, rng=random
+):
+    """
+    Generate random phrases from the word lists of one theme.
+
+    Args:
+        words (dict): The theme's word lists by category, e.g. `word_bank["Medieval"]`.
+        categories (list, optional): The categories joined to build each phrase.
+        num_phrases (int, optional): The number of phrases. Defaults to 5.
+        rng (random.Random, optional): The random source. Defaults to the `random` module.
+
+    Returns:
+        list: The phrase strings.
+
+    Example:
+        >>> generate_phrase_texts(word_bank["Medieval"], rng=random.Random(1))
+        ['Enchanted Tavern Trade', 'Majestic Relic Serenade', ...]
+    """
+    return [
+        " ".join(rng.choice(words[category]) for category in categories)
+        for _ in range(num_phrases)
+    ]
+
+
+def pick_icons(icons, num_icons=5, rng=random):
+    """
+    Return a random selection of distinct entries from a list of icons.
+
+    Args:
+        icons (list): The icons to pick from, paths or (surface, path) pairs.
+        num_icons (int, optional): The number of icons. Defaults to 5.
+        rng (random.Random, optional): The random source. Defaults to the `random` module.
+    """
+    num_icons = min(num_icons, len(icons))
+    return [icons[i] for i in rng.sample(range(len(icons)), num_icons)]
+
+
+def sample_phrase_indices(lengths, num_phrases, rng):
+    """
+    Draw the word indexes of many phrases at once with NumPy.
+
+    Args:
+        lengths (list): The number of words in each category, in phrase order.
+        num_phrases (int): The number of phrases.
+        rng (numpy.random.Generator): The random source.
+
+    Returns:
+        numpy.ndarray: A (num_phrases, len(lengths)) array of word indexes.
+
+    The draws come out in the same order as drawing one index per category per phrase
+    with `rng.integers`, so for a given seed the result equals `phrase_indices_loop`.
+
+    Example:
+        >>> sample_phrase_indices([75, 60, 66], 2, np.random.default_rng(1))
+        array([[35, 30, 49],
+               [71,  2,  9]])
+    """
+    return rng.integers(0, np.asarray(lengths), size=(num_phrases, len(lengths)))
+
+
+def phrase_indices_loop(lengths, num_phrases, rng):
+    """
+    Draw phrase word indexes one category at a time, as the "python" sampler does.
+
+    This is the per-phrase reference for `sample_phrase_indices`; both consume the
+    same random numbers of a `numpy.random.Generator` in the same order.
+    """
+    return [[int(rng.integers(0, n)) for n in lengths] for _ in range(num_phrases)]
+
+
+def word_arrays(words, categories=DEFAULT_CATEGORIES):
+    """
+    Return the word lists of a theme's categories as NumPy object arrays.
+    """
+    return [np.array(list(words[category]), dtype=object) for category in categories]
+
+
+def join_phrases(arrays, indices):
+    """
+    Turn a matrix of word indexes into phrase strings.
+
+    Args:
+        arrays (list): The category word arrays returned by `word_arrays`.
+        indices (numpy.ndarray): The word indexes returned by `sample_phrase_indices`.
+
+    Returns:
+        numpy.ndarray: The phrases, as an object array of strings.
+    """
+    phrases = arrays[0][indices[:, 0]]
+    for column in range(1, len(arrays)):
+        phrases = phrases + " " + arrays[column][indices[:, column]]
+    return phrases
+
+
+# AliasTable class
+class AliasTable:
+    """
+    Draws indexes with given weights in O(1) per draw, using Vose's alias method.
+
+    Args:
+        weights (list): The non-negative weight of every index, at least one positive.
+
+    Building the table is O(n); every draw afterwards costs one uniform index and one
+    uniform float, however many entries the table has.
+
+    Example:
+        >>> table = AliasTable([3, 1])
+        >>> table.sample(random.Random(1))  # 0 three times as often as 1
+        0
+    """
+
+    def __init__(self, weights):
+        n = len(weights)
+        total = float(sum(weights))
+        if not n or total <= 0:
+            raise ValueError("an alias table needs at least one positive weight")
+        scaled = [weight * n / total for weight in weights]
+        self.probabilities = [1.0] * n
+        self.aliases = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probabilities[less] = scaled[less]
+            self.aliases[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left is 1.0 up to rounding error and keeps its defaults
+
+    def __len__(self):
+        return len(self.aliases)
+
+    def sample(self, rng=random):
+        i = rng.randrange(len(self.aliases))
+        return i if rng.random() < self.probabilities[i] else self.aliases[i]
+
+
+# ThemeBlend class
+class ThemeBlend:
+    """
+    Draws phrases and icon themes from a weighted blend of several themes.
+
+    Args:
+        words (dict): The word lists of every blended theme by category, e.g.
+        `{theme: word_bank[theme] for theme in weights}`.
+        weights (dict): The weight of every blended theme.
+        categories (list, optional): The categories joined to build each phrase.
+
+    Every word of a phrase comes from a theme drawn by weight, then uniformly from that
+    theme's list, so a theme's share of the words follows its weight however long its
+    lists are. The alias tables are built once here, so a draw is O(1) in the number of
+    blended themes and words. Build a new blend when the selection changes.
+
+    Example:
+        blend = ThemeBlend(
+            {theme: word_bank[theme] for theme in ("Medieval", "Monsters")},
+            {"Medieval": 3, "Monsters": 1},
+        )
+        print(blend.phrase(random.Random(1)), blend.theme(random.Random(1)))
+    """
+
+    def __init__(self, words, weights, categories=DEFAULT_CATEGORIES):
+        self.themes = [theme for theme, weight in weights.items() if weight > 0]
+        self.categories = list(categories)
+        self._theme_table = AliasTable([weights[theme] for theme in self.themes])
+        self._categories = []  # (word lists, alias table over their themes)
+        for category in self.categories:
+            themes = [t for t in self.themes if len(words[t].get(category, ())) > 0]
+            self._categories.append(
+                (
+                    [words[t][category] for t in themes],
+                    AliasTable([weights[t] for t in themes]),
+                )
+            )
+
+    def phrase(self, rng=random):
+        return " ".join(
+            rng.choice(lists[table.sample(rng)]) for lists, table in self._categories
+        )
+
+    def theme(self, rng=random):
+        return self.themes[self._theme_table.sample(rng)]
+
+
+# Icon listings of this process, the folders are only globbed once
+_icon_listings = {}
+
+
+def generate_seed(word_bank, theme, categories=DEFAULT_CATEGORIES, rng=random):
+    """
+    Generate one story seed: five phrases and five icon paths for a theme.
+
+    Args:
+        word_bank (WordBank): The word lists of every theme, or a dict shaped the same way.
+        theme (str): The theme, as named in its JSON file, e.g. "Medieval".
+        categories (list, optional): The categories joined to build each phrase.
+        rng (random.Random, optional): The random source. Defaults to the `random` module.
+
+    Returns:
+        dict: The seed with "theme", "phrases" and "icons" keys.
+    """
+    folder = icon_folder(theme)
+    if folder not in _icon_listings:
+        _icon_listings[folder] = icon_files(folder)
+    return {
+        "theme": theme,
+        "phrases": generate_phrase_texts(word_bank[theme], categories, rng=rng),
+        "icons": pick_icons(_icon_listings[folder], rng=rng),
+    }
+
+
+def resolve_themes(word_bank, names):
+    """
+    Map theme names given in any letter case to the names used in the word bank.
+
+    Raises:
+        ValueError: If a name does not match any theme.
+    """
+    by_lower = {theme.lower(): theme for theme in word_bank.themes()}
+    if not names:
+        return sorted(word_bank.themes())
+    themes = []
+    for name in names:
+        if name.lower() not in by_lower:
+            raise ValueError(f"unknown theme: {name}")
+        themes.append(by_lower[name.lower()])
+    return themes
+
+
+def chunk_generator(seed, chunk_index):
+    """
+    Return the NumPy random stream of one chunk, derived from the run seed and chunk number.
+    """
+    return np.random.default_rng([seed, chunk_index])
+
+
+# Worker process state, set once per process by _init_worker
+_worker_bank = None
+
+
+def _init_worker(bank_path):
+    global _worker_bank
+    # Plain lists index faster than the mapped WordLists, and all themes fit in a few KB
+    word_bank = WordBank(bank_path)
+    _worker_bank = {
+        theme: {category: list(words) for category, words in word_bank[theme].items()}
+        for theme in word_bank.themes()
+    }
+    word_bank.close()
+
+
+def _generate_chunk(job):
+    # Draws every number in the order _generate_chunk_numpy does, one at a time
+    chunk_index, size, seed, themes, categories = job
+    rng = chunk_generator(seed, chunk_index)
+    theme_indices = [int(rng.integers(0, len(themes))) for _ in range(size)]
+    seeds = [None] * size
+    for t, theme in enumerate(themes):
+        rows = [row for row, index in enumerate(theme_indices) if index == t]
+        if not rows:
+            continue
+        folder = icon_folder(theme)
+        if folder not in _icon_listings:
+            _icon_listings[folder] = icon_files(folder)
+        icons = _icon_listings[folder]
+        words = [_worker_bank[theme][category] for category in categories]
+
+        indices = phrase_indices_loop([len(w) for w in words], len(rows) * 5, rng)
+        phrases = [" ".join(w[i] for w, i in zip(words, row)) for row in indices]
+
+        num_icons = min(5, len(icons))
+        for n, row in enumerate(rows):
+            row_icons = []
+            if num_icons:
+                keys = rng.random(len(icons)).tolist()
+                order = sorted(range(len(icons)), key=keys.__getitem__)
+                row_icons = [icons[i] for i in order[:num_icons]]
+            seeds[row] = json.dumps(
+                {
+                    "theme": theme,
+                    "phrases": phrases[n * 5 : n * 5 + 5],
+                    "icons": row_icons,
+                }
+            )
+    seeds.append("")
+    return "\n".join(seeds)
+
+
+# NumPy word arrays and icon listings of this worker, built on first use per theme
+_worker_arrays = {}
+
+
+def _generate_chunk_numpy(job):
+    chunk_index, size, seed, themes, categories = job
+    rng = chunk_generator(seed, chunk_index)
+    theme_indices = rng.integers(0, len(themes), size=size)
+    seeds = [None] * size
+    for t, theme in enumerate(themes):
+        rows = np.flatnonzero(theme_indices == t)
+        if not len(rows):
+            continue
+        if theme not in _worker_arrays:
+            folder = icon_folder(theme)
+            _worker_arrays[theme] = (
+                word_arrays(_worker_bank[theme], categories),
+                np.array(icon_files(folder), dtype=object),
+            )
+        arrays, icons = _worker_arrays[theme]
+
+        # Five phrases per seed, drawn for every seed of this theme in one call
+        indices = sample_phrase_indices([len(a) for a in arrays], len(rows) * 5, rng)
+        phrases = join_phrases(arrays, indices).reshape(len(rows), 5).tolist()
+
+        # Distinct icons per seed: the first columns of a random permutation per row
+        num_icons = min(5, len(icons))
+        if num_icons:
+            order = rng.random((len(rows), len(icons))).argsort(axis=1)[:, :num_icons]
+            icon_rows = icons[order].tolist()
+        else:
+            icon_rows = [[] for _ in rows]
+
+        for row, row_phrases, row_icons in zip(rows.tolist(), phrases, icon_rows):
+            seeds[row] = json.dumps(
+                {"theme": theme, "phrases": row_phrases, "icons": row_icons}
+            )
+    seeds.append("")
+    return "\n".join(seeds)
+
+
+SAMPLERS = {"python": _generate_chunk, "numpy": _generate_chunk_numpy}
+
+
+def generate_batch(
+    count,
+    seed,
+    themes,
+    categories=DEFAULT_CATEGORIES,
+    workers=None,
+    chunk_size=10000,
+    bank_path=DEFAULT_PATH,
+    sampler="python",
+):
+    """
+    Generate seeds in parallel and yield them as blocks of JSON Lines text, in order.
+
+    Args:
+        count (int): The number of seeds.
+        seed (int): The run seed; the same seed always yields the same output.
+        themes (list): The themes to draw from; each seed picks one at random.
+        categories (list, optional): The categories joined to build each phrase.
+        workers (int, optional): The number of worker processes. Defaults to the CPU count.
+        chunk_size (int, optional): The number of seeds per chunk. Defaults to 10000.
+        bank_path (str, optional): The compiled word bank. Defaults to "data/wordbank.bin".
+        sampler (str, optional): "python" draws number by number, "numpy" draws every
+        phrase of a chunk in a few vectorized calls; both write the same seeds for a
+        seed. Defaults to "python".
+
+    Yields:
+        str: Newline-terminated JSON Lines text for one chunk of seeds.
+
+    Raises:
+        ImportError: If numpy is not installed.
+    """
+    if np is None:
+        raise ImportError("generating seeds in bulk needs numpy installed")
+    jobs = [
+        (index, min(chunk_size, count - start), seed, themes, categories)
+        for index, start in enumerate(range(0, count, chunk_size))
+    ]
+    generate_chunk = SAMPLERS[sampler]
+    if workers == 1:
+        _init_worker(bank_path)
+        yield from map(generate_chunk, jobs)
+        return
+    with multiprocessing.Pool(workers, _init_worker, (bank_path,)) as pool:
+        yield from pool.imap(generate_chunk, jobs)
+
+
+def benchmark(
+    num_phrases=1000000, seed=0, theme="Introduce", categories=DEFAULT_CATEGORIES
+):
+    """
+    Compare phrase generation throughput of the per-phrase loop and the NumPy sampler.
+
+    Args:
+        num_phrases (int, optional): The number of phrases per run. Defaults to 1000000.
+        seed (int, optional): The seed used by every run. Defaults to 0.
+        theme (str, optional): The theme to draw from. Defaults to "Introduce".
+        categories (list, optional): The categories joined to build each phrase.
+
+    Returns:
+        dict: Phrases per second of each run, and whether the "python" and "numpy"
+        samplers wrote the same seeds for the same seed.
+    """
+    import time
+
+    word_bank = open_word_bank()
+    words = {category: list(word_bank[theme][category]) for category in categories}
+    word_bank.close()
+    lengths = [len(words[category]) for category in categories]
+    arrays = word_arrays(words, categories)
+
+    def timed(function):
+        start = time.perf_counter()
+        function()
+        return num_phrases / (time.perf_counter() - start)
+
+    results = {
+        "phrases": num_phrases,
+        "loop (random.choice)": timed(
+            lambda: generate_phrase_texts(
+                words, categories, num_phrases, random.Random(seed)
+            )
+        ),
+        "numpy indexes": timed(
+            lambda: sample_phrase_indices(
+                lengths, num_phrases, np.random.default_rng(seed)
+            )
+        ),
+        "numpy joined": timed(
+            lambda: join_phrases(
+                arrays,
+                sample_phrase_indices(
+                    lengths, num_phrases, np.random.default_rng(seed)
+                ),
+            ).tolist()
+        ),
+    }
+
+    # Both samplers must write the same seeds, checked on a chunk of every theme
+    _init_worker(DEFAULT_PATH)
+    job = (0, min(num_phrases // 5, 20000), seed, sorted(_worker_bank), categories)
+    results["identical"] = _generate_chunk(job) == _generate_chunk_numpy(job)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate story seeds as JSON Lines without opening a window."
+    )
+    parser.add_argument(
+        "--themes", nargs="*", help="themes to draw from (default: all)"
+    )
+    parser.add_argument(
+        "--count",
+        type=int,
+        help="number of seeds (default: 1000), or of phrases with --benchmark",
+    )
+    parser.add_argument(
+        "--seed", type=int, default=0, help="seed of the random streams"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="worker processes")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="seeds per job")
+    parser.add_argument("-o", "--output", help="output file (default: stdout)")
+    parser.add_argument(
+        "--sampler", choices=sorted(SAMPLERS), default="python", help="phrase sampler"
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="compare the per-phrase loop with the numpy sampler and exit",
+    )
+    args = parser.parse_args(argv)
+
+    if np is None:
+        parser.error("generating seeds in bulk needs numpy installed")
+    if args.benchmark:
+        for name, value in benchmark(args.count or 1000000, args.seed).items():
+            print(
+                f"{name:>22}: {value:,.0f}"
+                if isinstance(value, float)
+                else f"{name:>22}: {value}"
+            )
+        return
+
+    word_bank = open_word_bank()  # Compiles data/wordbank.bin once before forking
+    try:
+        themes = resolve_themes(word_bank, args.themes)
+    except ValueError as error:
+        parser.error(str(error))
+    word_bank.close()
+
+    if args.count is None:
+        args.count = 1000
+    output = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for block in generate_batch(
+            args.count,
+            args.seed,
+            themes,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            sampler=args.sampler,
+        ):
+            output.write(block)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
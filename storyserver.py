@@ -0,0 +1,277 @@
+"""
+HTTP service handing out story seeds as JSON, so other tools can use them without the GUI.
+
+    python storyserver.py --host 0.0.0.0 --port 8000
+
+Endpoints:
+    GET /themes                 the names of every theme
+    GET /seed                   a seed of a random theme
+    GET /seed/<theme>           a seed of one theme, e.g. /seed/Medieval
+    GET /icons/<theme>/<file>   an icon file, as referenced by the "icons" of a seed
+
+A seed is the same dict `storyseeds.generate_seed` returns: five phrases built from
+the categories and five icon paths. Seeds are generated ahead of time into a pool per
+theme, already encoded as response bodies, and a background task refills a pool as
+soon as it runs low, so a request only takes a seed off a queue. Icon files are read
+once and served from memory with ETag and Cache-Control headers, so browsers and
+clients revalidate them with a 304 at most. Connections are kept alive between requests.
+
+The server is a single asyncio event loop using only the standard library.
+"""
+
+import os
+import json
+import random
+import asyncio
+import argparse
+import hashlib
+from collections import deque
+from urllib.parse import unquote
+
+from storyseeds import DEFAULT_CATEGORIES, generate_seed
+from wordbank import open_word_bank
+
+REASONS = {
+    200: "OK",
+    304: "Not Modified",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+}
+ICON_MAX_AGE = 86400  # seconds
+
+
+# SeedPool class
+class SeedPool:
+    """
+    Pools of pre-generated, JSON-encoded seeds for every theme.
+
+    Args:
+        word_bank (WordBank): The word lists of every theme.
+        categories (list, optional): The categories joined to build each phrase.
+        pool_size (int, optional): The number of seeds kept ready per theme. Defaults to 256.
+        rng (random.Random, optional): The random source. Defaults to a new `random.Random`.
+
+    Methods:
+        take(theme): Return an encoded seed, generating one on the spot if the pool is empty.
+        refill(): Background task that tops up the pools that ran low.
+
+    Example:
+        pool = SeedPool(open_word_bank())
+        body = pool.take("Medieval")
+    """
+
+    def __init__(
+        self, word_bank, categories=DEFAULT_CATEGORIES, pool_size=256, rng=None
+    ):
+        # Plain lists index faster than the mapped WordLists, and all themes fit in a few KB
+        self.words = {
+            theme: {
+                category: list(words) for category, words in word_bank[theme].items()
+            }
+            for theme in word_bank.themes()
+        }
+        self.themes = sorted(self.words)
+        self.categories = categories
+        self.pool_size = pool_size
+        self.rng = rng or random.Random()
+        self.pools = {theme: deque() for theme in self.themes}
+        self._low = asyncio.Event()
+        self._low.set()  # Fill every pool on start
+
+    def _generate(self, theme):
+        seed = generate_seed(self.words, theme, self.categories, self.rng)
+        seed["icons"] = [
+            path.replace(os.sep, "/") for path in seed["icons"]
+        ]  # URL paths
+        return json.dumps(seed).encode("utf-8")
+
+    def take(self, theme):
+        pool = self.pools[theme]
+        if len(pool) <= self.pool_size // 2:
+            self._low.set()
+        if pool:
+            return pool.popleft()
+        return self._generate(theme)
+
+    async def refill(self, batch=32):
+        while True:
+            await self._low.wait()
+            self._low.clear()
+            for theme, pool in self.pools.items():
+                while len(pool) < self.pool_size:
+                    for _ in range(min(batch, self.pool_size - len(pool))):
+                        pool.append(self._generate(theme))
+                    await asyncio.sleep(0)  # Let waiting requests in between batches
+
+
+# IconFiles class
+class IconFiles:
+    """
+    Icon files read once and kept in memory with their ETags.
+
+    Args:
+        icons_dir (str, optional): The folder holding the icon theme folders. Defaults to "icons".
+
+    Methods:
+        get(path): Return (body, etag) of an icon path like "Medieval/icon_00000001.png",
+        or None when there is no such PNG.
+    """
+
+    def __init__(self, icons_dir="icons"):
+        self.icons_dir = os.path.abspath(icons_dir)
+        self._files = {}
+
+    def get(self, path):
+        entry = self._files.get(path)
+        if entry is None:
+            full_path = os.path.abspath(os.path.join(self.icons_dir, path))
+            # Refuse anything outside the icons folder, e.g. "../data/medieval.json"
+            if not full_path.startswith(self.icons_dir + os.sep):
+                return None
+            if not full_path.endswith(".png") or not os.path.isfile(full_path):
+                return None
+            with open(full_path, "rb") as file:
+                body = file.read()
+            etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+            entry = self._files[path] = (body, etag)
+        return entry
+
+
+def response(status, body=b"", content_type="application/json", headers=()):
+    """
+    Return the bytes of an HTTP/1.1 response.
+    """
+    head = [
+        f"HTTP/1.1 {status} {REASONS[status]}",
+        f"Content-Type: {content_type}",
+        f"Content-Length: {len(body)}",
+        *headers,
+        "",
+        "",
+    ]
+    return "\r\n".join(head).encode("latin-1") + body
+
+
+# StoryServer class
+class StoryServer:
+    """
+    The HTTP front end of a `SeedPool` and the icon files.
+
+    Args:
+        pool (SeedPool): The seed pools to serve from.
+        icons (IconFiles): The icon files to serve.
+
+    Example:
+        server = StoryServer(SeedPool(open_word_bank()), IconFiles())
+        asyncio.run(server.serve("127.0.0.1", 8000))
+    """
+
+    def __init__(self, pool, icons):
+        self.pool = pool
+        self.icons = icons
+        self._themes_body = json.dumps(pool.themes).encode("utf-8")
+        self._theme_names = {theme.lower(): theme for theme in pool.themes}
+
+    def route(self, path, headers):
+        if path == "/themes":
+            return response(200, self._themes_body)
+        if path == "/seed":
+            return response(200, self.pool.take(self.pool.rng.choice(self.pool.themes)))
+        if path.startswith("/seed/"):
+            theme = self._theme_names.get(unquote(path[6:]).lower())
+            if theme is None:
+                return response(404, b'{"error": "unknown theme"}')
+            return response(200, self.pool.take(theme))
+        if path.startswith("/icons/"):
+            entry = self.icons.get(unquote(path[7:]))
+            if entry is None:
+                return response(404, b'{"error": "unknown icon"}')
+            body, etag = entry
+            cache_headers = (
+                f"ETag: {etag}",
+                f"Cache-Control: public, max-age={ICON_MAX_AGE}",
+            )
+            if headers.get("if-none-match") == etag:
+                return response(304, headers=cache_headers)
+            return response(200, body, "image/png", cache_headers)
+        return response(404, b'{"error": "not found"}')
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                parts = request_line.decode("latin-1").split()
+                if len(parts) != 3:
+                    writer.write(response(400, b'{"error": "bad request"}'))
+                    break
+                method, target, version = parts
+                keep_alive = (
+                    headers.get("connection", "").lower() != "close"
+                    if version == "HTTP/1.1"
+                    else headers.get("connection", "").lower() == "keep-alive"
+                )
+                if method != "GET":
+                    writer.write(response(405, b'{"error": "only GET is supported"}'))
+                else:
+                    writer.write(self.route(target.split("?", 1)[0], headers))
+                if not keep_alive:
+                    break
+                # Only wait for the socket when its buffer is filling up
+                if writer.transport.get_write_buffer_size() > 65536:
+                    await writer.drain()
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host="127.0.0.1", port=8000):
+        refill = asyncio.create_task(self.pool.refill())
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"serving story seeds on http://{host}:{port}/")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            refill.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve story seeds over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1", help="address to listen on")
+    parser.add_argument("--port", type=int, default=8000, help="port to listen on")
+    parser.add_argument(
+        "--pool-size", type=int, default=256, help="seeds kept ready per theme"
+    )
+    parser.add_argument("--seed", type=int, help="seed of the random source")
+    args = parser.parse_args(argv)
+
+    word_bank = open_word_bank()
+
+    async def run():
+        pool = SeedPool(
+            word_bank, pool_size=args.pool_size, rng=random.Random(args.seed)
+        )
+        await StoryServer(pool, IconFiles()).serve(args.host, args.port)
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        word_bank.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+from collections import OrderedDict
+
+
+# TextCache class
+class TextCache:
+    """
+    A bounded cache of rendered text surfaces with least-recently-used eviction.
+
+    Args:
+        max_entries (int, optional): The number of surfaces kept before the least recently
+        used one is evicted. Defaults to 256.
+
+    Attributes:
+        hits (int): The number of `render` calls answered from the cache.
+        misses (int): The number of `render` calls that had to rasterize the text.
+
+    Methods:
+        render(font, text, color, selected=False): Return a rendered text surface.
+        invalidate(text=None): Drop cached surfaces for a string, or all of them.
+        stats(): Return the hit/miss counters and current size.
+
+    Rendering text with `pygame.font.Font.render` is the most expensive part of drawing
+    a frame, yet the title, labels, button captions and phrases almost never change
+    between frames. Surfaces are keyed on (font, text, color, selected) so the selected
+    and unselected captions of a `DataSetButton` are cached side by side.
+
+    Example:
+        cache = TextCache(max_entries=128)
+        surface = cache.render(gothic_font, "Generate", BLACK)
+        print(cache.stats())
+    """
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._surfaces = OrderedDict()
+
+    def render(self, font, text, color, selected=False):
+        key = (font, text, color, selected)
+        surface = self._surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self._surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, True, color)
+        self._surfaces[key] = surface
+        if len(self._surfaces) > self.max_entries:
+            self._surfaces.popitem(last=False)  # Evict the least recently used surface
+        return surface
+
+    def invalidate(self, text=None):
+        """
+        Drop cached surfaces so they are rendered again on next use.
+
+        Args:
+            text (str, optional): Only drop the surfaces rendered for this string. When
+            omitted the whole cache is cleared.
+        """
+        if text is None:
+            self._surfaces.clear()
+            return
+        for key in [key for key in self._surfaces if key[1] == text]:
+            del self._surfaces[key]
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": len(self._surfaces),
+            "max_entries": self.max_entries,
+        }
+
+    def __len__(self):
+        return len(self._surfaces)
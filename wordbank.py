@@ -0,0 +1,343 @@
+"""
+Compiles every data/*.json word list into one file and memory-maps it.
+
+The JSON files stay the editable source of truth. The compiled file holds a single
+table of unique strings shared by all themes, plus for every theme and category an
+array of indexes into that table, so a word that appears in ten themes is stored once.
+
+File layout (all integers are little-endian uint32):
+    header          magic, version, source checksum, counts and section offsets
+    string offsets  n_strings + 1 offsets into the string data
+    string data     the UTF-8 encoded strings back to back
+    theme table     (name id, source file id, first category, category count)
+    category table  (name id, first word, word count)
+    word ids        string ids of every word list back to back
+"""
+
+import os
+import sys
+import json
+import mmap
+import glob
+import struct
+import zlib
+from array import array
+
+MAGIC = b"WBNK"
+VERSION = 1
+HEADER = struct.Struct("<4s9I")
+DEFAULT_PATH = os.path.join("data", "wordbank.bin")
+
+
+def _uint32_array(values):
+    arr = array("I", values)
+    if sys.byteorder == "big":
+        arr.byteswap()
+    return arr.tobytes()
+
+
+def _source_files(data_dir):
+    return sorted(glob.glob(os.path.join(data_dir, "*.json")))
+
+
+def _source_checksum(files):
+    # Changes when a JSON file is added, removed or renamed
+    names = "\n".join(os.path.basename(f) for f in files)
+    return zlib.crc32(names.encode("utf-8"))
+
+
+def compile_word_bank(data_dir="data", path=DEFAULT_PATH):
+    """
+    Compile every JSON word list in `data_dir` into a single word bank file.
+
+    Args:
+        data_dir (str, optional): The folder holding the theme JSON files. Defaults to "data".
+        path (str, optional): Where to write the compiled file. Defaults to "data/wordbank.bin".
+
+    Returns:
+        dict: Counts describing the compiled file, including how many words were stored
+        and how many unique strings they were reduced to.
+
+    Example:
+        >>> compile_word_bank()
+        {'themes': 36, 'words': 3490, 'strings': 2676, 'bytes': 48204}
+    """
+    files = _source_files(data_dir)
+    string_ids = {}
+
+    def intern(text):
+        if text not in string_ids:
+            string_ids[text] = len(string_ids)
+        return string_ids[text]
+
+    themes = []
+    categories = []
+    word_ids = []
+    for file_path in files:
+        with open(file_path, encoding="utf-8") as file:
+            file_data = json.load(file)
+        source_id = intern(os.path.basename(file_path))
+        for theme, theme_categories in file_data.items():
+            themes.append(
+                (intern(theme), source_id, len(categories), len(theme_categories))
+            )
+            for category, words in theme_categories.items():
+                categories.append((intern(category), len(word_ids), len(words)))
+                word_ids.extend(intern(word) for word in words)
+
+    encoded = [text.encode("utf-8") for text in string_ids]
+    offsets = [0]
+    for blob in encoded:
+        offsets.append(offsets[-1] + len(blob))
+
+    string_offsets = _uint32_array(offsets)
+    string_data = b"".join(encoded)
+    theme_table = _uint32_array(value for row in themes for value in row)
+    category_table = _uint32_array(value for row in categories for value in row)
+    word_table = _uint32_array(word_ids)
+
+    # Keep every uint32 section 4-byte aligned so it can be cast straight from the map
+    string_data += b"\0" * (-len(string_data) % 4)
+    sections = [string_offsets, string_data, theme_table, category_table, word_table]
+    positions = []
+    position = HEADER.size
+    for section in sections:
+        positions.append(position)
+        position += len(section)
+
+    header = HEADER.pack(
+        MAGIC,
+        VERSION,
+        _source_checksum(files),
+        len(encoded),
+        len(themes),
+        len(categories),
+        *positions[:4],
+    )
+    # Write to a temporary file first so a running app never maps a half-written file
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as file:
+        file.write(header)
+        for section in sections:
+            file.write(section)
+    os.replace(temp_path, path)
+
+    return {
+        "themes": len(themes),
+        "words": len(word_ids),
+        "strings": len(encoded),
+        "bytes": position,
+    }
+
+
+def needs_rebuild(data_dir="data", path=DEFAULT_PATH):
+    """
+    Return True when the compiled word bank is missing or older than the JSON sources.
+    """
+    if not os.path.exists(path):
+        return True
+    files = _source_files(data_dir)
+    if files and os.path.getmtime(path) < max(os.path.getmtime(f) for f in files):
+        return True
+    with open(path, "rb") as file:
+        header = file.read(HEADER.size)
+    if len(header) < HEADER.size:
+        return True
+    magic, version, checksum = HEADER.unpack(header)[:3]
+    return magic != MAGIC or version != VERSION or checksum != _source_checksum(files)
+
+
+def open_word_bank(data_dir="data", path=DEFAULT_PATH):
+    """
+    Memory-map the compiled word bank, compiling it first when it is out of date.
+
+    Args:
+        data_dir (str, optional): The folder holding the theme JSON files. Defaults to "data".
+        path (str, optional): The compiled file. Defaults to "data/wordbank.bin".
+
+    Returns:
+        WordBank: The memory-mapped word bank.
+
+    Example:
+        >>> word_bank = open_word_bank()
+        >>> random.choice(word_bank["Medieval"]["Nouns"])
+        'Castle'
+    """
+    if needs_rebuild(data_dir, path):
+        compile_word_bank(data_dir, path)
+    return WordBank(path)
+
+
+# WordList class
+class WordList:
+    """
+    A read-only sequence of the words of one category of one theme.
+
+    Args:
+        bank (WordBank): The word bank holding the strings.
+        start (int): The position of the first word in the word id table.
+        count (int): The number of words.
+
+    It supports `len()`, indexing and iteration, so it can be passed straight to
+    `random.choice`. Words are decoded from the map on first access and shared with
+    every other theme that uses the same word.
+    """
+
+    def __init__(self, bank, start, count):
+        self._bank = bank
+        self._start = start
+        self._count = count
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("word index out of range")
+        return self._bank.string(self._bank.word_ids[self._start + index])
+
+    def __iter__(self):
+        for index in range(self._count):
+            yield self[index]
+
+    def __repr__(self):
+        return f"WordList({list(self)!r})"
+
+
+# WordBank class
+class WordBank:
+    """
+    A memory-mapped, compiled word bank holding the word lists of every theme.
+
+    Args:
+        path (str): The compiled file written by `compile_word_bank`.
+
+    Methods:
+        themes(): Return the names of every theme.
+        load(file_name): Return the themes defined in one JSON source file.
+        update(file_name, file_data): Replace the themes of one source file in memory.
+        string(string_id): Return the decoded string for a string id.
+        close(): Unmap the file.
+
+    `word_bank[theme][category]` returns a `WordList`, so the bank can be used wherever
+    the dictionaries returned by `json.load` were used before. Switching themes costs a
+    dictionary lookup and no file access.
+
+    Example:
+        word_bank = WordBank("data/wordbank.bin")
+        nouns = word_bank["Monsters"]["Nouns"]
+        print(len(nouns), nouns[0])
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        (
+            magic,
+            version,
+            _,
+            n_strings,
+            n_themes,
+            n_categories,
+            offsets_pos,
+            data_pos,
+            themes_pos,
+            categories_pos,
+        ) = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} word bank")
+
+        self._offsets = self._uint32_view(offsets_pos, n_strings + 1)
+        self._data_pos = data_pos
+        theme_rows = self._uint32_view(themes_pos, n_themes * 4)
+        category_rows = self._uint32_view(categories_pos, n_categories * 3)
+        words_pos = categories_pos + n_categories * 3 * 4
+        n_words = (len(self._map) - words_pos) // 4
+        self.word_ids = self._uint32_view(words_pos, n_words)
+        self._strings = [None] * n_strings  # Decoded strings, filled on first use
+
+        self._themes = {}
+        self._sources = {}
+        for t in range(n_themes):
+            name_id, source_id, first, count = theme_rows[t * 4 : t * 4 + 4]
+            categories = {}
+            for c in range(first, first + count):
+                category_id, start, size = category_rows[c * 3 : c * 3 + 3]
+                categories[self.string(category_id)] = WordList(self, start, size)
+            name = self.string(name_id)
+            self._themes[name] = categories
+            self._sources.setdefault(self.string(source_id), []).append(name)
+
+    def _uint32_view(self, position, count):
+        view = memoryview(self._map)[position : position + count * 4]
+        if sys.byteorder == "big":
+            arr = array("I", view.tobytes())
+            arr.byteswap()
+            return arr
+        return view.cast("I")
+
+    def string(self, string_id):
+        text = self._strings[string_id]
+        if text is None:
+            start = self._data_pos + self._offsets[string_id]
+            end = self._data_pos + self._offsets[string_id + 1]
+            text = self._strings[string_id] = self._map[start:end].decode("utf-8")
+        return text
+
+    def themes(self):
+        return list(self._themes)
+
+    def load(self, file_name):
+        """
+        Return the themes defined in one JSON source file, shaped like its `json.load` result.
+        """
+        return {
+            theme: self._themes[theme] for theme in self._sources.get(file_name, [])
+        }
+
+    def update(self, file_name, file_data):
+        """
+        Replace the themes of one JSON source file without recompiling the bank.
+
+        Args:
+            file_name (str): The source file, e.g. "monsters.json".
+            file_data (dict): Its parsed content, or None when the file was removed.
+
+        Returns:
+            set: The names of the themes that were added, changed or removed.
+
+        The new word lists are kept in memory on top of the mapped file; the compiled
+        file itself is brought up to date by `open_word_bank` on the next start.
+        """
+        touched = set(self._sources.pop(file_name, []))
+        for theme in touched:
+            del self._themes[theme]
+        if file_data is not None:
+            for theme, categories in file_data.items():
+                self._themes[theme] = {
+                    category: list(words) for category, words in categories.items()
+                }
+            self._sources[file_name] = list(file_data)
+            touched.update(file_data)
+        return touched
+
+    def __getitem__(self, theme):
+        return self._themes[theme]
+
+    def __contains__(self, theme):
+        return theme in self._themes
+
+    def close(self):
+        # Release the views before the map, mmap refuses to close with exports alive
+        self._offsets = self.word_ids = None
+        self._themes.clear()
+        self._map.close()
+
+
+if __name__ == "__main__":
+    print(compile_word_bank())